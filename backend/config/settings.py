@@ -18,15 +18,69 @@ class Settings:
     FIREBASE_AUTH_PROVIDER_X509_CERT_URL = os.getenv("FIREBASE_AUTH_PROVIDER_X509_CERT_URL", "https://www.googleapis.com/oauth2/v1/certs")
     FIREBASE_CLIENT_X509_CERT_URL = os.getenv("FIREBASE_CLIENT_X509_CERT_URL")
     FIREBASE_UNIVERSE_DOMAIN = os.getenv("FIREBASE_UNIVERSE_DOMAIN", "googleapis.com")
+
+    # Use the native async Firestore client in services.async_services
+    FIRESTORE_ASYNC = (os.getenv("FIRESTORE_ASYNC") or "false").lower() == "true"
     
     # Cloudinary settings
     CLOUDINARY_CLOUD_NAME = os.getenv("CLOUDINARY_CLOUD_NAME")
     CLOUDINARY_API_KEY = os.getenv("CLOUDINARY_API_KEY")
     CLOUDINARY_API_SECRET = os.getenv("CLOUDINARY_API_SECRET")
+    UPLOAD_WORKERS = int(os.getenv("UPLOAD_WORKERS") or 8)
 
     # Gemini
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+    # Shared Gemini gateway (services.llm_gateway)
+    LLM_DEFAULT_MODEL = os.getenv("LLM_DEFAULT_MODEL") or "gemini-2.5-flash"
+    LLM_MODEL_ROUTES = os.getenv("LLM_MODEL_ROUTES") or ""  # e.g. "plan=gemini-2.5-flash-lite,compare=gemini-2.5-pro"
+    LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE") or 60)
+    LLM_BURST = int(os.getenv("LLM_BURST") or 10)
+    LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY") or 8)
+    LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS") or 120)
+    LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES") or 4)
+    LLM_BACKOFF_SECONDS = float(os.getenv("LLM_BACKOFF_SECONDS") or 1)
+    LLM_MAX_BACKOFF_SECONDS = float(os.getenv("LLM_MAX_BACKOFF_SECONDS") or 30)
+
+    # Local cache for AI results (e.g. extracted questions per paper)
+    AI_CACHE_DIR = os.getenv("AI_CACHE_DIR") or ".cache/ai"
+    AI_CACHE_MAX_BYTES = int(os.getenv("AI_CACHE_MAX_MB") or 256) * 1024 * 1024
+
+    # Send the PDF text layer instead of the file for pages with at least this much text
+    PDF_TEXT_PREPASS = (os.getenv("PDF_TEXT_PREPASS") or "true").lower() == "true"
+    PDF_TEXT_MIN_CHARS = int(os.getenv("PDF_TEXT_MIN_CHARS") or 40)
+
+    # Question papers longer than this are extracted in concurrent page chunks
+    EXTRACTION_CHUNK_PAGES = int(os.getenv("EXTRACTION_CHUNK_PAGES") or 10)
+    EXTRACTION_CONCURRENCY = int(os.getenv("EXTRACTION_CONCURRENCY") or 4)
+    EXTRACTION_CHUNK_RETRIES = int(os.getenv("EXTRACTION_CHUNK_RETRIES") or 2)
+
+    # Generated learning plans are reused per topic/grade/curriculum
+    PLAN_CACHE_TTL_SECONDS = float(os.getenv("PLAN_CACHE_TTL_SECONDS") or 30 * 24 * 3600)
+    PLAN_CONCURRENCY = int(os.getenv("PLAN_CONCURRENCY") or 4)
+
+    # Lifetime of the Gemini cached answer key used by a class grading session
+    GRADING_CACHE_TTL_SECONDS = int(os.getenv("GRADING_CACHE_TTL_SECONDS") or 900)
+
+    # Grade option-letter, numeric and one-word answers locally before Gemini
+    LOCAL_GRADING = (os.getenv("LOCAL_GRADING") or "true").lower() == "true"
+    GRADER_NUMERIC_TOLERANCE = float(os.getenv("GRADER_NUMERIC_TOLERANCE") or 1e-6)
+
+    # process_exam pipeline: "two_step" (extract, then compare) or "single" (one combined call)
+    EXAM_PIPELINE_MODE = os.getenv("EXAM_PIPELINE_MODE") or "two_step"
+
+    # Max student answer sheets graded in parallel by a class batch
+    GRADING_CONCURRENCY = int(os.getenv("GRADING_CONCURRENCY") or 4)
+
+    # In-process cache for teacher list endpoints
+    LIST_CACHE_TTL_SECONDS = float(os.getenv("LIST_CACHE_TTL_SECONDS") or 30)
+    LIST_CACHE_MAX_ENTRIES = int(os.getenv("LIST_CACHE_MAX_ENTRIES") or 512)
+    LIST_CACHE_LISTEN = (os.getenv("LIST_CACHE_LISTEN") or "false").lower() == "true"
+
+    # Background exam jobs
+    JOB_DB_PATH = os.getenv("JOB_DB_PATH") or "jobs.db"
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS") or 2)
+
     # fastapi 
     FASTAPI_API_KEY = os.getenv("FASTAPI_API_KEY")
     FASTAPI_SECRET = os.getenv("FASTAPI_SECRET")
@@ -1,5 +1,5 @@
 import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import credentials, firestore, firestore_async
 from config.settings import settings
 
 # Get Firebase credentials from settings (environment variables)
@@ -16,3 +16,6 @@ except ValueError:
     pass
 
 db = firestore.client()
+
+# Async client for services.async_services, only created when enabled
+async_db = firestore_async.client() if settings.FIRESTORE_ASYNC else None
@@ -1,26 +1,38 @@
 from fastapi import FastAPI
-from fastapi.responses import RedirectResponse, HTMLResponse, FileResponse
+from fastapi.responses import RedirectResponse, HTMLResponse, FileResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi_login import LoginManager 
 from fastapi_login.exceptions import InvalidCredentialsException
-from fastapi import Depends, Request, UploadFile, Response, Form, status, HTTPException
-from pydantic import BaseModel
-import json, os, shutil, httpx
+from fastapi import Depends, Request, UploadFile, Response, Form, status, HTTPException, Query
+from pydantic import BaseModel, Field
+import asyncio, json, os, tempfile, httpx
 from pathlib import Path
-from google import genai
+from contextlib import asynccontextmanager
 from models import teacher, lesson_plan, performance_overview, recommendation, weak_area, upload_record, test_paper, syllabus
-from services import teacher_service, lesson_plan_service, performance_service, recommendation_service, weak_area_service, storage_service, upload_service, test_paper_service, syllabus_service, AI_engine
+from services import teacher_service, lesson_plan_service, performance_service, recommendation_service, weak_area_service, storage_service, upload_service, test_paper_service, syllabus_service, AI_engine, job_service, unit_of_work, dashboard_service, async_services, exam_analysis_service, llm_gateway
+from utils.app_logger import logger
 
-app = FastAPI()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client for the app's lifetime so downloads reuse connections
+    app.state.http_client = httpx.AsyncClient(
+        follow_redirects=True,
+        timeout=httpx.Timeout(60.0, connect=10.0),
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
+    )
+    await job_service.JobService.start()
+    yield
+    await job_service.JobService.stop()
+    await app.state.http_client.aclose()
 
-SECRET = "FirstSecretWord"
-teacher_id = "VirtualTour"
-os.environ["GEMINI_API_KEY"] = 'YOUR_API_KEY'
 
+app = FastAPI(lifespan=lifespan)
 
-client = genai.Client(api_key=os.environ["GEMINI_API_KEY"])
+
+SECRET = "FirstSecretWord"
+teacher_id = "VirtualTour"
 manager = LoginManager(SECRET, token_url="/auth/login", use_cookie=True)
 manager.cookie_name = "platform-cookie"
 
@@ -34,6 +46,26 @@ def load_user(username: str):
    return user
 
 
+# Upper bound for ?limit= on list endpoints
+MAX_PAGE_SIZE = 500
+
+
+def split_fields(fields: str | None):
+    """Turn a comma-separated ?fields= value into a projection list"""
+    return [f.strip() for f in fields.split(",") if f.strip()] if fields else None
+
+
+def list_response(items: list, limit: int | None, start_after: str | None, fields: list | None):
+    """
+    Plain list for a bare listing. With any paging or projection parameter
+    the items carry their "id", so the page and its next cursor are returned.
+    """
+    if not (limit or start_after or fields):
+        return {json.dumps(items)}
+    next_cursor = items[-1]["id"] if limit and len(items) == limit else None
+    return {json.dumps({"items": items, "next_cursor": next_cursor})}
+
+
 @app.get("/")
 async def read_root():
     return {"message": "Welcome to the new innovative project!"}
@@ -42,86 +74,99 @@ async def read_root():
 @app.post("/submit_teacher/")
 async def submit_teacher_form(name: str = Form(...), email: str = Form(...)):
     newteacher = teacher.Teacher(name=name, email=email)
-    teacher_service.TeacherService.save_teacher(newteacher)
+    await async_services.AsyncTeacherService.save_teacher(newteacher)
     return {"Form received"}
 
 
 @app.post("/get_teacher/")
 async def get_teacher():
-    teacher =teacher_service.TeacherService.get_teacher(teacher_id)
+    teacher = await async_services.AsyncTeacherService.get_teacher(teacher_id)
     return {json.dumps(teacher)}
 
 
 @app.post("/update_teacher/")
 async def teacher_update(field: str = Form(...), value: str = Form(...)):
-    teacher_service.TeacherService.update_field(teacher_id, field, value)
+    await async_services.AsyncTeacherService.update_field(teacher_id, field, value)
     return {"Form received"}
 
 
 @app.post("/add_lesson/")
 async def add_lesson_form(lessonplan: lesson_plan.LessonPlan):
-    lesson_plan_service.LessonPlanService.add_lesson_plan(teacher_id, lessonplan)
+    await async_services.AsyncLessonPlanService.add_lesson_plan(teacher_id, lessonplan)
     return {"Form received"}
 
 
 @app.post("/save_lesson/")
 async def save_lesson_form(plan_id: str = Form(...), lessonplan: lesson_plan.LessonPlan = Depends()):
-    lesson_plan_service.LessonPlanService.save_lesson_plan(teacher_id, plan_id, lessonplan)
+    await async_services.AsyncLessonPlanService.save_lesson_plan(teacher_id, plan_id, lessonplan)
     return {"Form received"}
 
 
 @app.post("/list_lessons/")
-async def list_lessons():
-    lessons = lesson_plan_service.LessonPlanService.list_lesson_plans(teacher_id)
-    return {json.dumps(lessons)}
+async def list_lessons(limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE), start_after: str | None = None, fields: str | None = None):
+    projection = split_fields(fields)
+    lessons = await async_services.AsyncLessonPlanService.list_lesson_plans(teacher_id, limit, start_after, projection)
+    return list_response(lessons, limit, start_after, projection)
+
+
+@app.get("/dashboard/")
+async def dashboard(request: Request):
+    data = await dashboard_service.DashboardService.get_dashboard_async(teacher_id)
+    body, etag = dashboard_service.DashboardService.serialize(data)
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @app.post("/performance_save/")
 async def performance_save(performance: performance_overview.PerformanceOverview):
-    performance_service.PerformanceService.save_overview(teacher_id, performance)
+    await async_services.AsyncPerformanceService.save_overview(teacher_id, performance)
     return {"Form received"}
 
 
 @app.post("/performance_overview/")
 async def list_performances():
-    performances = performance_service.PerformanceService.get_overview(teacher_id)
+    performances = await async_services.AsyncPerformanceService.get_overview(teacher_id)
     return {json.dumps(performances)}
 
 
 @app.post("/add_recommendation/")
 async def add_recommendation_form(recommendation: recommendation.Recommendation):
-    recommendation_service.RecommendationService.add_recommendation(teacher_id, recommendation)
+    await async_services.AsyncRecommendationService.add_recommendation(teacher_id, recommendation)
     return {"Form received"}
 
 
 @app.post("/save_recommendation/")
 async def save_recommendation_form(rec_id: str = Form(...), recommendation: recommendation.Recommendation = Depends()):
-    recommendation_service.RecommendationService.save_recommendation(teacher_id, rec_id, recommendation)
+    await async_services.AsyncRecommendationService.save_recommendation(teacher_id, rec_id, recommendation)
     return {"Form received"}
 
 
 @app.post("/list_recommendations/")
-async def list_recommendations():
-    recommendations = recommendation_service.RecommendationService.list_recommendations(teacher_id)
-    return {json.dumps(recommendations)}
+async def list_recommendations(limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE), start_after: str | None = None, fields: str | None = None):
+    projection = split_fields(fields)
+    recommendations = await async_services.AsyncRecommendationService.list_recommendations(teacher_id, limit, start_after, projection)
+    return list_response(recommendations, limit, start_after, projection)
 
 
 @app.post("/add_weak_area/")
 async def add_weak_area_form(weakarea: weak_area.WeakArea):
-   weak_area_service.WeakAreaService.add_weak_area(teacher_id, weakarea)
+   await async_services.AsyncWeakAreaService.add_weak_area(teacher_id, weakarea)
    return {"Form received"}
 
 
 @app.post("/save_weak_area/")
 async def save_weak_area_form(topic_id: str = Form(...), weakarea: weak_area.WeakArea = Depends()):
-    weak_area_service.WeakAreaService.save_weak_area(teacher_id, topic_id, weakarea)
+    await async_services.AsyncWeakAreaService.save_weak_area(teacher_id, topic_id, weakarea)
     return {"Form received"}
 
 
 @app.post("/list_weak_areas/")
-async def list_weak_areas():
-    weakareas = weak_area_service.WeakAreaService.list_weak_areas(teacher_id)
-    return {json.dumps(weakareas)}
+async def list_weak_areas(limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE), start_after: str | None = None, fields: str | None = None):
+    projection = split_fields(fields)
+    weakareas = await async_services.AsyncWeakAreaService.list_weak_areas(teacher_id, limit, start_after, projection)
+    return list_response(weakareas, limit, start_after, projection)
 
 
 @app.post("/auth/login")
@@ -153,12 +198,11 @@ class RequestData(BaseModel):
 
 @app.post("/generate-content/")
 async def generate_content(request_data: RequestData):
-    model_inputs = {
-        "urls": request_data.urls,
-        "text": request_data.text,
-        "question": request_data.question
-    }
-    response = client.models.generate_content(**model_inputs)
+    contents = [request_data.question, request_data.text, *request_data.urls]
+    response = await llm_gateway.gateway.generate_async(
+        model=llm_gateway.gateway.model_for("content"),
+        contents=contents
+    )
     return {response.text}
 
 
@@ -179,93 +223,278 @@ def logout(request: Request, user=Depends(manager)):
     return resp
 
 
+async def store_upload(file: UploadFile):
+    """
+    Stream an uploaded file to Cloudinary off the event loop and return its
+    URL and content hash. Content this teacher uploaded before is not re-sent.
+    """
+    file_hash = await asyncio.to_thread(storage_service.StorageService.hash_fileobj, file.file)
+    url = await asyncio.to_thread(
+        storage_service.StorageService.upload_stream, file.file, str(file.filename),
+        teacher_id=teacher_id, file_hash=file_hash
+    )
+    if not url:
+        raise HTTPException(status_code=502, detail="File upload failed")
+    return url, file_hash
+
+
 @app.post("/uploader/")
 async def uploader(file: UploadFile):
-    save_path = f"./uploads/{file.filename}"
-    with open(save_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    url = storage_service.StorageService.upload_file(save_path)
-    upload_data = upload_record.UploadRecord(str(file.filename), "TextDocument", url)
-    upload_service.UploadService.add_upload(teacher_id, upload_data)
+    url, file_hash = await store_upload(file)
+    upload_data = upload_record.UploadRecord(str(file.filename), "TextDocument", url, file_hash=file_hash)
+    await async_services.AsyncUploadService.add_upload(teacher_id, upload_data)
     return Response(content=str("File Uploaded"), media_type="text")
 
 
 @app.post("/list_uploads/")
-async def list_uploads():
-    uploads = upload_service.UploadService.list_uploads(teacher_id)
-    return {json.dumps(uploads)}
+async def list_uploads(limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE), start_after: str | None = None, fields: str | None = None):
+    projection = split_fields(fields)
+    uploads = await async_services.AsyncUploadService.list_uploads(teacher_id, limit, start_after, projection)
+    return list_response(uploads, limit, start_after, projection)
 
 
 @app.post("/test_paper_uploader/")
 async def test_paper_uploader(file: UploadFile):
-    save_path = f"./uploads/{file.filename}"
-    with open(save_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    url = storage_service.StorageService.upload_file(save_path)
-    upload_data = upload_record.UploadRecord(str(file.filename), "TestPaper", url)
-    upload_service.UploadService.add_upload(teacher_id, upload_data)
+    url, file_hash = await store_upload(file)
+    upload_data = upload_record.UploadRecord(str(file.filename), "TestPaper", url, file_hash=file_hash)
     testpaper_upload_data = test_paper.TestPaper(str(file.filename), url) 
-    test_paper_service.TestPaperService.add_test_paper(teacher_id, testpaper_upload_data)
+    batch = unit_of_work.UnitOfWork()
+    upload_service.UploadService.add_upload(teacher_id, upload_data, batch=batch)
+    test_paper_service.TestPaperService.add_test_paper(teacher_id, testpaper_upload_data, batch=batch)
+    if not await asyncio.to_thread(batch.commit):
+        raise HTTPException(status_code=500, detail="Error saving upload records")
     return Response(content=str("File Uploaded"), media_type="text")
 
 
 @app.post("/list_testpaper_uploads/")
-async def list_testpaper_uploads():
-    uploads = test_paper_service.TestPaperService.list_test_papers(teacher_id)
-    return {json.dumps(uploads)}
+async def list_testpaper_uploads(limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE), start_after: str | None = None, fields: str | None = None):
+    projection = split_fields(fields)
+    uploads = await async_services.AsyncTestPaperService.list_test_papers(teacher_id, limit, start_after, projection)
+    return list_response(uploads, limit, start_after, projection)
 
 
 @app.post("/syllabus_uploader/")
 async def syllabus_uploader(file: UploadFile):
-    save_path = f"./uploads/{file.filename}"
-    with open(save_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    url = storage_service.StorageService.upload_file(save_path)
-    upload_data = upload_record.UploadRecord(str(file.filename), "SyllabusPaper", url)
-    upload_service.UploadService.add_upload(teacher_id, upload_data)
+    url, file_hash = await store_upload(file)
+    upload_data = upload_record.UploadRecord(str(file.filename), "SyllabusPaper", url, file_hash=file_hash)
     syllabus_upload_data = syllabus.Syllabus(str(file.filename), url) 
-    syllabus_service.SyllabusService.add_syllabus(teacher_id, syllabus_upload_data)
+    batch = unit_of_work.UnitOfWork()
+    upload_service.UploadService.add_upload(teacher_id, upload_data, batch=batch)
+    syllabus_service.SyllabusService.add_syllabus(teacher_id, syllabus_upload_data, batch=batch)
+    if not await asyncio.to_thread(batch.commit):
+        raise HTTPException(status_code=500, detail="Error saving upload records")
     return Response(content=str("File Uploaded"), media_type="text")
 
 
 @app.post("/list_syllabus_uploads/")
-async def list_syllabus_uploads():
-    uploads = syllabus_service.SyllabusService.list_syllabi(teacher_id)
-    return {json.dumps(uploads)}
+async def list_syllabus_uploads(limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE), start_after: str | None = None, fields: str | None = None):
+    projection = split_fields(fields)
+    uploads = await async_services.AsyncSyllabusService.list_syllabi(teacher_id, limit, start_after, projection)
+    return list_response(uploads, limit, start_after, projection)
 
 
-def download_file(url: str, filename: str): 
-    download_dir = Path.home() / "downloads"
-    file_path = download_dir / filename
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+
+def exam_workspace():
+    """Per-request scratch directory, removed with its files when the request ends"""
+    return tempfile.TemporaryDirectory(prefix="lumos-exam-")
+
+
+async def download_file(url: str, filename: str, workspace: str):
+    file_path = Path(workspace) / filename
     try:
-        with httpx.Client() as client:
-            response = client.get(url)
-            response.raise_for_status()  
-            with open(file_path, "wb") as file:
-                file.write(response.content)
-        return file_path
-    except Exception as e:
-        return f"Error downloading PDF: {str(e)}"
+        async with app.state.http_client.stream("GET", url) as response:
+            response.raise_for_status()
+            # Disk I/O runs on a worker thread so the loop keeps serving requests
+            file = await asyncio.to_thread(open, file_path, "wb")
+            try:
+                async for chunk in response.aiter_bytes(DOWNLOAD_CHUNK_SIZE):
+                    await asyncio.to_thread(file.write, chunk)
+            finally:
+                await asyncio.to_thread(file.close)
+        return str(file_path)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=502, detail=f"Error downloading PDF: {str(e)}")
+
+
+async def download_files(workspace: str, *downloads):
+    """
+    Download several (url, filename) pairs into the workspace concurrently.
+    The first failure cancels the downloads still running before it is raised.
+    """
+    tasks = [asyncio.create_task(download_file(url, filename, workspace)) for url, filename in downloads]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def check_exam_mode(mode: str | None):
+    if mode is not None and mode not in AI_engine.EXAM_MODES:
+        raise HTTPException(status_code=422, detail=f"mode must be one of {list(AI_engine.EXAM_MODES)}")
 
 
 @app.post("/process-exam/")
-async def process_exam(questionpdf_url: str, teacher_pdf: str, student_pdf: str):
-    exam_data = AI_engine.process_exam(download_file(questionpdf_url, "One.pdf"), download_file(teacher_pdf, "Two.pdf"), download_file(student_pdf, "Three.pdf"))
+async def process_exam(questionpdf_url: str, teacher_pdf: str, student_pdf: str, mode: str | None = None):
+    check_exam_mode(mode)
+    with exam_workspace() as workspace:
+        files = await download_files(workspace, (questionpdf_url, "question.pdf"), (teacher_pdf, "teacher.pdf"), (student_pdf, "student.pdf"))
+        exam_data = await AI_engine.process_exam_async(*files, mode=mode)
     return json.dumps(exam_data)
 
 
+class ClassExamData(BaseModel):
+    questionpdf_url: str
+    teacher_pdf: str
+    student_pdfs: list[str]
+    max_concurrency: int | None = Field(None, ge=1)
+
+
+@app.post("/process_class/")
+async def process_class(exam: ClassExamData):
+    with exam_workspace() as workspace:
+        question_file, teacher_file, *student_files = await download_files(
+            workspace,
+            (exam.questionpdf_url, "question.pdf"),
+            (exam.teacher_pdf, "teacher.pdf"),
+            *((url, f"student_{idx}.pdf") for idx, url in enumerate(exam.student_pdfs, 1))
+        )
+        class_data = await AI_engine.process_class_async(question_file, teacher_file, student_files, exam.max_concurrency)
+    for student, url in zip(class_data["students"], exam.student_pdfs):
+        student["student_answers"] = url
+    return json.dumps(class_data)
+
+
 @app.post("/generate_plan/")
 async def generate_plan(topic: str):
-    plan = AI_engine.generate_learning_plan(topic)
+    plan = await AI_engine.generate_learning_plan_async(topic)
     return plan
 
 
+async def run_exam_full(questionpdf_url: str, teacher_pdf: str, student_pdf: str, test_paper_id: str | None = None, reanalyze: bool = False, weakest_k: int | None = None, mode: str | None = None):
+    """
+    Full exam analysis. With a test_paper_id the result is written back to
+    Firestore, and a paper already analyzed with the same inputs is served
+    from there instead of re-running the model. weakest_k switches to
+    structured lesson plans for the k weakest topics; mode picks the
+    process_exam pipeline.
+    """
+    ExamAnalysisService = exam_analysis_service.ExamAnalysisService
+    inputs = {"questionpdf_url": questionpdf_url, "teacher_pdf": teacher_pdf, "student_pdf": student_pdf, "weakest_k": weakest_k}
+    if mode:
+        inputs["mode"] = mode
+    if test_paper_id:
+        paper = await asyncio.to_thread(test_paper_service.TestPaperService.get_test_paper, teacher_id, test_paper_id)
+        if paper is None:
+            raise HTTPException(status_code=404, detail="Test paper not found")
+    if test_paper_id and not reanalyze:
+        stored = await asyncio.to_thread(ExamAnalysisService.get_analysis, teacher_id, test_paper_id, inputs)
+        if stored is not None:
+            return stored
+
+    with exam_workspace() as workspace:
+        files = await download_files(workspace, (questionpdf_url, "question.pdf"), (teacher_pdf, "teacher.pdf"), (student_pdf, "student.pdf"))
+        full_data = await AI_engine.process_exam_full_async(*files, weakest_k=weakest_k, mode=mode)
+
+    if test_paper_id:
+        await asyncio.to_thread(ExamAnalysisService.save_analysis, teacher_id, test_paper_id, full_data, inputs)
+    return full_data
+
+
+class PlanRequest(BaseModel):
+    topics: list[str]
+    grade: str = ""
+    curriculum: str = ""
+
+
+@app.post("/generate_plans/")
+async def generate_plans(request_data: PlanRequest):
+    plans = await AI_engine.generate_learning_plans_async(
+        request_data.topics, request_data.grade, request_data.curriculum
+    )
+    return json.dumps(plans)
+
+
+@app.post("/generate_structured_plans/")
+async def generate_structured_plans(topics: list[str]):
+    plans = await AI_engine.generate_structured_lesson_plans_async(topics)
+    return json.dumps([plan.to_dict() for plan in plans])
+
+
 @app.post("/process_exam_full/")
-async def process_exam_full(questionpdf_url: str, teacher_pdf: str, student_pdf: str):
-    full_data = AI_engine.process_exam_full(download_file(questionpdf_url, "One.pdf"), download_file(teacher_pdf, "Two.pdf"), download_file(student_pdf, "Three.pdf"))
+async def process_exam_full(questionpdf_url: str, teacher_pdf: str, student_pdf: str, test_paper_id: str | None = None, reanalyze: bool = False, weakest_k: int | None = None, mode: str | None = None):
+    check_exam_mode(mode)
+    full_data = await run_exam_full(questionpdf_url, teacher_pdf, student_pdf, test_paper_id, reanalyze, weakest_k, mode)
     return json.dumps(full_data)
 
 
+def sse_message(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/process_exam_full_stream/")
+async def process_exam_full_stream(questionpdf_url: str, teacher_pdf: str, student_pdf: str, mode: str | None = None):
+    """
+    Server-Sent Events version of /process_exam_full/: one event per pipeline
+    stage, the learning plan as plan_token events, then done (or error).
+    """
+    check_exam_mode(mode)
+
+    async def events():
+        try:
+            with exam_workspace() as workspace:
+                files = await download_files(workspace, (questionpdf_url, "question.pdf"), (teacher_pdf, "teacher.pdf"), (student_pdf, "student.pdf"))
+                yield sse_message("files_downloaded", {})
+                async for event in AI_engine.process_exam_full_events(*files, mode=mode):
+                    yield sse_message(event["event"], event["data"])
+        except HTTPException as e:
+            yield sse_message("error", {"detail": e.detail})
+        except Exception as e:
+            logger.error(f"Error streaming exam analysis: {e}")
+            yield sse_message("error", {"detail": "Exam analysis failed"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+job_service.JobService.register_handler("process_exam_full", run_exam_full)
+
+
+@app.post("/submit_exam_full/")
+async def submit_exam_full(questionpdf_url: str, teacher_pdf: str, student_pdf: str, test_paper_id: str | None = None, reanalyze: bool = False, weakest_k: int | None = None, mode: str | None = None):
+    check_exam_mode(mode)
+    job_id = job_service.JobService.submit("process_exam_full", {
+        "questionpdf_url": questionpdf_url,
+        "teacher_pdf": teacher_pdf,
+        "student_pdf": student_pdf,
+        "test_paper_id": test_paper_id,
+        "reanalyze": reanalyze,
+        "weakest_k": weakest_k,
+        "mode": mode
+    })
+    return json.dumps({"job_id": job_id, "status": "queued"})
+
+
+@app.get("/job_status/{job_id}")
+async def job_status(job_id: str):
+    job = job_service.JobService.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return json.dumps({
+        "job_id": job["id"],
+        "status": job["status"],
+        "result": job["result"],
+        "error": job["error"]
+    })
+
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],
@@ -4,12 +4,14 @@ class LessonPlan:
                  objectives: list,
                  activities: list,
                  assessments: list,
-                 created_at=None):
+                 created_at=None,
+                 content: str = None):
         self.topic = topic
         self.objectives = objectives
         self.activities = activities
         self.assessments = assessments
         self.created_at = created_at
+        self.content = content
 
     def to_dict(self):
         return self.__dict__
@@ -3,11 +3,13 @@ class UploadRecord:
                  file_name: str,
                  file_type: str,
                  file_url: str,
-                 upload_date=None):
+                 upload_date=None,
+                 file_hash: str = None):
         self.file_name = file_name
         self.file_type = file_type
         self.file_url = file_url
         self.upload_date = upload_date
+        self.file_hash = file_hash
 
     def to_dict(self):
         return self.__dict__
@@ -3,11 +3,13 @@ class WeakArea:
                  topic_name: str,
                  mastery: int,
                  difficulty: str,
-                 last_updated=None):
+                 last_updated=None,
+                 samples: int = None):
         self.topic_name = topic_name
         self.mastery = mastery
         self.difficulty = difficulty
         self.last_updated = last_updated
+        self.samples = samples
 
     def to_dict(self):
         return self.__dict__
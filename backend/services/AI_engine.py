@@ -6,27 +6,174 @@ sys.path.insert(0, BASE_DIR)
 
 print("AI_engine PYTHONPATH:", BASE_DIR)
 
+import asyncio
 import base64
+import hashlib
+import io
 import os
 import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, asynccontextmanager
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
+from config.settings import settings
+from models.lesson_plan import LessonPlan
+from services import local_grader
+from services.llm_gateway import gateway
 from utils.app_logger import logger
+from utils.result_cache import ResultCache
 
+try:
+    import pypdf
+except ImportError:  # chunked extraction and the text pre-pass are skipped without it
+    pypdf = None
 
 
 
-load_dotenv()
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+load_dotenv()
 
 # --- AI CONFIG ---
-client = genai.Client(api_key=GEMINI_API_KEY)
+# All Gemini calls go through services.llm_gateway (rate limit, retries,
+# timeouts); models are routed per task via LLM_MODEL_ROUTES.
+EXTRACTION_MODEL = gateway.model_for("extraction")
+COMPARE_MODEL = gateway.model_for("compare")
+PLAN_MODEL = gateway.model_for("plan")
+
+# Extracted questions are cached per (paper bytes, prompt, model), so a class
+# sharing one question paper only pays for a single extraction call.
+extraction_cache = ResultCache(
+    os.path.join(settings.AI_CACHE_DIR, "questions"),
+    settings.AI_CACHE_MAX_BYTES
+)
+
+# Learning plans are shared across teachers: the same normalized topic for
+# the same grade/curriculum is only generated once per PLAN_CACHE_TTL_SECONDS.
+plan_cache = ResultCache(
+    os.path.join(settings.AI_CACHE_DIR, "plans"),
+    settings.AI_CACHE_MAX_BYTES,
+    ttl_seconds=settings.PLAN_CACHE_TTL_SECONDS
+)
+
+# Per-page text layers of PDFs, keyed by file hash and PDF_TEXT_RULE (bump
+# it whenever the page classification changes so old entries aren't reused)
+PDF_TEXT_RULE = "text-without-images"
+pdf_text_cache = ResultCache(
+    os.path.join(settings.AI_CACHE_DIR, "pdf_text"),
+    settings.AI_CACHE_MAX_BYTES
+)
+
+
+# -------------------------------------------------------
+# Local PDF text pre-pass: send text for pages with a usable text layer
+# -------------------------------------------------------
+def _pdf_blob(pdf_bytes):
+    return types.Part(
+        inline_data=types.Blob(
+            mime_type="application/pdf",
+            data=pdf_bytes  # IMPORTANT: raw bytes, NOT base64
+        )
+    )
+
+
+def _has_images(page):
+    """True if a page draws any image (scans, handwriting, diagrams, figures)"""
+    try:
+        return len(page.images) > 0
+    except Exception:
+        # Unreadable resources: assume there is something the text can't carry
+        return True
+
+
+def _good_text(text):
+    """True if a page's text layer looks born-digital rather than scanned or garbled"""
+    text = (text or "").strip()
+    if len(text) < settings.PDF_TEXT_MIN_CHARS or "(cid:" in text:
+        return False
+    readable = sum(1 for c in text if c.isprintable() or c.isspace()) - text.count("\ufffd")
+    return readable / len(text) >= 0.95
+
+
+def pdf_page_texts(pdf_bytes):
+    """
+    Text of every page, or None per page whose text layer isn't usable or
+    that has images, which only the PDF itself carries. Cached by file hash
+    and classification rule. Returns None if the pre-pass is disabled,
+    pypdf isn't installed or the PDF can't be parsed.
+    """
+    if pypdf is None or not settings.PDF_TEXT_PREPASS:
+        return None
+
+    key = ResultCache.make_key(
+        hashlib.sha256(pdf_bytes).hexdigest(), PDF_TEXT_RULE, str(settings.PDF_TEXT_MIN_CHARS)
+    )
+    pages = pdf_text_cache.get(key)
+    if pages is not None:
+        return pages
+
+    try:
+        reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+        pages = []
+        for page in reader.pages:
+            text = page.extract_text() or ""
+            pages.append(text if _good_text(text) and not _has_images(page) else None)
+    except Exception as e:
+        logger.warning(f"Could not read PDF text layer, sending the PDF: {e}")
+        return None
+
+    pdf_text_cache.set(key, pages)
+    return pages
+
+
+def _pdf_pages(pdf_bytes, indices):
+    reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+    writer = pypdf.PdfWriter()
+    for index in indices:
+        writer.add_page(reader.pages[index])
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+def pdf_parts(pdf_bytes):
+    """
+    Gemini parts for a PDF: one text part per run of pages with a good text
+    layer, and a (sub-)PDF blob only for runs of scanned pages.
+    """
+    pages = pdf_page_texts(pdf_bytes)
+    if not pages or all(text is None for text in pages):
+        return [_pdf_blob(pdf_bytes)]
+
+    parts = []
+    run = []
+    scanned = None
+    for index, text in enumerate(pages + [False]):
+        is_scanned = text is None
+        if run and (text is False or is_scanned != scanned):
+            if scanned:
+                parts.append(_pdf_blob(_pdf_pages(pdf_bytes, run)))
+            else:
+                parts.append(types.Part(text="\n\n".join(
+                    f"[Page {i + 1}]\n{pages[i]}" for i in run
+                )))
+            run = []
+        scanned = is_scanned
+        run.append(index)
+
+    return parts
+
+
+def pdf_text(pdf_bytes):
+    """Full text of a PDF if every page has a good text layer, else None"""
+    pages = pdf_page_texts(pdf_bytes)
+    if not pages or any(text is None for text in pages):
+        return None
+    return "\n".join(pages)
 
 
 # -------------------------------------------------------
-# Utility: load PDF or text file into Gemini-compatible Part
+# Utility: load PDF or text file into Gemini-compatible Parts
 # -------------------------------------------------------
 def load_file(path):
     ext = path.lower()
@@ -36,33 +183,17 @@ def load_file(path):
         with open(path, "rb") as f:
             data = f.read()
 
-        return types.Part(
-            inline_data=types.Blob(
-                mime_type="application/pdf",
-                data=data  # IMPORTANT: raw bytes, NOT base64
-            )
-        )
+        return pdf_parts(data)
 
     # TEXT INPUT
     with open(path, "r", encoding="utf-8") as f:
-        return types.Part(text=f.read())
+        return [types.Part(text=f.read())]
 
 
 # -------------------------------------------------------
 # 1. Extract Questions + Topics
 # -------------------------------------------------------
-def extract_questions_with_topics(pdf_path):
-    with open(pdf_path, "rb") as f:
-        pdf_bytes = f.read()
-
-    pdf_input = types.Part(
-        inline_data=types.Blob(
-            mime_type="application/pdf",
-            data=pdf_bytes
-        )
-    )
-
-    prompt = """
+EXTRACT_QUESTIONS_PROMPT = """
 You are an expert educational examiner and curriculum specialist.
 Your task is to analyze the exam paper and extract:
 
@@ -97,25 +228,170 @@ STRICT FORMAT:
 Return ONLY the JSON array. No explanations.
 """
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=[types.Part(text=prompt), pdf_input],
+
+def _extraction_request(pdf_bytes, pages=None):
+    prompt = EXTRACT_QUESTIONS_PROMPT
+    if pages:
+        prompt += f"""
+These are pages {pages[0]}-{pages[1]} of a longer exam paper. Only include
+questions that START on these pages, keeping their printed question numbers.
+"""
+
+    return dict(
+        model=EXTRACTION_MODEL,
+        contents=[types.Part(text=prompt), *pdf_parts(pdf_bytes)],
         config=types.GenerateContentConfig(
             response_mime_type="application/json"
         )
     )
 
-    return json.loads(response.text)
+
+def _cached_extraction(pdf_path, use_cache):
+    with open(pdf_path, "rb") as f:
+        pdf_bytes = f.read()
+
+    cache_key = ResultCache.make_key(pdf_bytes, EXTRACT_QUESTIONS_PROMPT, EXTRACTION_MODEL)
+    if use_cache:
+        cached = extraction_cache.get(cache_key)
+        if cached is not None:
+            logger.info("♻️ Using cached question extraction")
+            return pdf_bytes, cache_key, cached
+
+    return pdf_bytes, cache_key, None
+
+
+def _split_pdf(pdf_bytes, chunk_pages):
+    """
+    Split a PDF into [((first_page, last_page), chunk_bytes)] of at most
+    chunk_pages pages. Returns None when the paper fits in one chunk or
+    pypdf isn't installed, meaning "send the whole file".
+    """
+    if pypdf is None or not chunk_pages:
+        return None
+
+    try:
+        reader = pypdf.PdfReader(io.BytesIO(pdf_bytes))
+        page_count = len(reader.pages)
+    except Exception as e:
+        logger.warning(f"Could not read PDF pages, extracting in one request: {e}")
+        return None
+
+    if page_count <= chunk_pages:
+        return None
+
+    chunks = []
+    for first in range(0, page_count, chunk_pages):
+        last = min(first + chunk_pages, page_count)
+        writer = pypdf.PdfWriter()
+        for page in reader.pages[first:last]:
+            writer.add_page(page)
+        buffer = io.BytesIO()
+        writer.write(buffer)
+        chunks.append(((first + 1, last), buffer.getvalue()))
+
+    return chunks
+
+
+def _merge_chunks(chunks, chunk_questions):
+    """
+    Concatenate per-chunk question lists in page order, dropping a question
+    repeated across a chunk boundary. Printed numbers are kept; a number
+    already used by an earlier chunk (e.g. a section restarting at 1) gets
+    the chunk's pages as a qualifier, like "1 (pages 5-8)", so every
+    question still has a unique number.
+    """
+    merged = []
+    seen = set()
+    numbers = set()
+    for ((first, last), _), questions in zip(chunks, chunk_questions):
+        for question in questions:
+            number = str(question.get("number"))
+            key = (number, " ".join(str(question.get("question", "")).split()).casefold())
+            if key in seen:
+                continue
+            seen.add(key)
+            if number in numbers:
+                question["number"] = f"{number} (pages {first}-{last})"
+            numbers.add(str(question["number"]))
+            merged.append(question)
+
+    return merged
+
+
+def _extract_chunk(pages, chunk_bytes):
+    for attempt in range(settings.EXTRACTION_CHUNK_RETRIES + 1):
+        response = gateway.generate(**_extraction_request(chunk_bytes, pages))
+        try:
+            return json.loads(response.text)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Unparseable extraction for pages {pages[0]}-{pages[1]} (attempt {attempt + 1}): {e}")
+    raise ValueError(f"Question extraction failed for pages {pages[0]}-{pages[1]}")
+
+
+async def _extract_chunk_async(pages, chunk_bytes):
+    request = await asyncio.to_thread(_extraction_request, chunk_bytes, pages)
+    for attempt in range(settings.EXTRACTION_CHUNK_RETRIES + 1):
+        response = await gateway.generate_async(**request)
+        try:
+            return json.loads(response.text)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Unparseable extraction for pages {pages[0]}-{pages[1]} (attempt {attempt + 1}): {e}")
+    raise ValueError(f"Question extraction failed for pages {pages[0]}-{pages[1]}")
+
+
+def extract_questions_with_topics(pdf_path, use_cache=True, chunk_pages=None):
+    """
+    Papers longer than chunk_pages (default EXTRACTION_CHUNK_PAGES) are
+    extracted in page-range chunks concurrently and merged; a chunk whose
+    JSON fails to parse is retried on its own.
+    """
+    pdf_bytes, cache_key, cached = _cached_extraction(pdf_path, use_cache)
+    if cached is not None:
+        return cached
+
+    chunks = _split_pdf(pdf_bytes, chunk_pages or settings.EXTRACTION_CHUNK_PAGES)
+    if chunks:
+        logger.info(f"📄 Extracting questions from {len(chunks)} page chunks...")
+        with ThreadPoolExecutor(max_workers=settings.EXTRACTION_CONCURRENCY) as pool:
+            questions = _merge_chunks(chunks, pool.map(lambda chunk: _extract_chunk(*chunk), chunks))
+    else:
+        response = gateway.generate(**_extraction_request(pdf_bytes))
+        questions = json.loads(response.text)
+
+    extraction_cache.set(cache_key, questions)
+    return questions
+
+
+async def extract_questions_with_topics_async(pdf_path, use_cache=True, chunk_pages=None):
+    # Reading, hashing and splitting the PDF are CPU/disk work: keep them off the loop
+    pdf_bytes, cache_key, cached = await asyncio.to_thread(_cached_extraction, pdf_path, use_cache)
+    if cached is not None:
+        return cached
+
+    chunks = await asyncio.to_thread(_split_pdf, pdf_bytes, chunk_pages or settings.EXTRACTION_CHUNK_PAGES)
+    if chunks:
+        logger.info(f"📄 Extracting questions from {len(chunks)} page chunks...")
+        semaphore = asyncio.Semaphore(settings.EXTRACTION_CONCURRENCY)
+
+        async def extract(chunk):
+            async with semaphore:
+                return await _extract_chunk_async(*chunk)
+
+        questions = _merge_chunks(chunks, await asyncio.gather(*(extract(c) for c in chunks)))
+    else:
+        request = await asyncio.to_thread(_extraction_request, pdf_bytes)
+        response = await gateway.generate_async(**request)
+        questions = json.loads(response.text)
+
+    extraction_cache.set(cache_key, questions)
+    return questions
 
 
 # -------------------------------------------------------
 # 2. Compare Teacher vs Student Answers
 # -------------------------------------------------------
-def compare_answers(questions, teacher_file, student_file):
-    teacher_part = load_file(teacher_file)
-    student_part = load_file(student_file)
-
-    prompt = f"""
+def _compare_prompt(questions):
+    return f"""
 You will compare TEACHER answers with STUDENT answers.
 
 QUESTIONS:
@@ -142,19 +418,178 @@ RULES:
 - Do NOT solve questions, only compare
 """
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
+
+def _compare_request(questions, teacher_file, student_file, cached_content=None, only_numbers=None):
+    """
+    With cached_content (see grading_session) the prompt, questions and
+    teacher answers are already held by Gemini, so only the student sheet
+    is sent. only_numbers restricts grading to the questions the local
+    grader left undecided.
+    """
+    student_parts = load_file(student_file)
+    scope = []
+    if only_numbers:
+        scope = [types.Part(text=f"ONLY grade these question numbers: {json.dumps(only_numbers)}")]
+
+    if cached_content:
+        return dict(
+            model=COMPARE_MODEL,
+            contents=[*scope, types.Part(text="STUDENT ANSWERS:"), *student_parts],
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                cached_content=cached_content
+            )
+        )
+
+    teacher_parts = load_file(teacher_file)
+
+    return dict(
+        model=COMPARE_MODEL,
         contents=[
-            types.Part(text=prompt),
-            types.Part(text="TEACHER ANSWERS:"), teacher_part,
-            types.Part(text="STUDENT ANSWERS:"), student_part
+            types.Part(text=_compare_prompt(questions)), *scope,
+            types.Part(text="TEACHER ANSWERS:"), *teacher_parts,
+            types.Part(text="STUDENT ANSWERS:"), *student_parts
         ],
         config=types.GenerateContentConfig(
             response_mime_type="application/json"
         )
     )
 
-    return json.loads(response.text)
+
+def _answer_text(path):
+    """Plain text of an answer sheet, or None when it can't be read locally"""
+    if path.lower().endswith(".pdf"):
+        with open(path, "rb") as f:
+            return pdf_text(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _grade_locally(questions, teacher_file, student_file):
+    """Returns (locally graded results, question numbers still needing Gemini)"""
+    all_numbers = [q.get("number") for q in questions]
+    if not settings.LOCAL_GRADING:
+        return [], all_numbers
+
+    teacher_text = _answer_text(teacher_file)
+    student_text = _answer_text(student_file)
+    if teacher_text is None or student_text is None:
+        return [], all_numbers
+
+    results, undecided = local_grader.grade_locally(questions, teacher_text, student_text)
+    logger.info(f"⚡ Graded {len(results)} of {len(questions)} questions locally")
+    return results, undecided
+
+
+def _pending_request(questions, teacher_file, student_file, cached_content, local, pending):
+    if not local:
+        return _compare_request(questions, teacher_file, student_file, cached_content)
+
+    # Compare on one normalized key: numbers may be ints or strings like "3"
+    pending_keys = {local_grader.question_number(n) for n in pending}
+    pending_questions = [
+        q for q in questions if local_grader.question_number(q.get("number")) in pending_keys
+    ]
+    if not pending_questions:
+        return _compare_request(questions, teacher_file, student_file, cached_content)
+    return _compare_request(pending_questions, teacher_file, student_file, cached_content, pending)
+
+
+def _merge_results(local, remote):
+    decided = {_question_number(r) for r in local}
+    merged = local + [r for r in remote if _question_number(r) not in decided]
+
+    return sorted(merged, key=lambda r: (_question_number(r) is None, _question_number(r) or 0))
+
+
+def _question_number(result):
+    return local_grader.question_number(result.get("question_number"))
+
+
+def compare_answers(questions, teacher_file, student_file, cached_content=None):
+    local, pending = _grade_locally(questions, teacher_file, student_file)
+    if not pending:
+        return local
+
+    response = gateway.generate(
+        **_pending_request(questions, teacher_file, student_file, cached_content, local, pending)
+    )
+
+    return _merge_results(local, json.loads(response.text))
+
+
+async def compare_answers_async(questions, teacher_file, student_file, cached_content=None):
+    # Reads both sheets and extracts their text: keep it off the loop
+    local, pending = await asyncio.to_thread(_grade_locally, questions, teacher_file, student_file)
+    if not pending:
+        return local
+
+    request = await asyncio.to_thread(
+        _pending_request, questions, teacher_file, student_file, cached_content, local, pending
+    )
+    response = await gateway.generate_async(**request)
+
+    return _merge_results(local, json.loads(response.text))
+
+
+# -------------------------------------------------------
+# Grading session: questions + answer key cached on Gemini
+# -------------------------------------------------------
+def _grading_cache_config(questions, teacher_file):
+    return types.CreateCachedContentConfig(
+        display_name="lumos-grading-session",
+        contents=[types.Content(role="user", parts=[
+            types.Part(text=_compare_prompt(questions)),
+            types.Part(text="TEACHER ANSWERS:"), *load_file(teacher_file)
+        ])],
+        ttl=f"{settings.GRADING_CACHE_TTL_SECONDS}s"
+    )
+
+
+@contextmanager
+def grading_session(questions, teacher_file):
+    """
+    Upload the questions and teacher answers once as Gemini cached content
+    and yield its name for compare_answers(cached_content=...). The cache
+    is deleted on exit and expires after GRADING_CACHE_TTL_SECONDS anyway.
+
+    Yields None if the cache can't be created (e.g. the key is below the
+    model's minimum cacheable size); callers then send everything inline.
+    """
+    name = None
+    try:
+        name = gateway.create_cache(COMPARE_MODEL, _grading_cache_config(questions, teacher_file)).name
+    except Exception as e:
+        logger.warning(f"Grading cache unavailable, sending answer key inline: {e}")
+
+    try:
+        yield name
+    finally:
+        if name:
+            try:
+                gateway.delete_cache(COMPARE_MODEL, name)
+            except Exception as e:
+                logger.warning(f"Error deleting grading cache {name}: {e}")
+
+
+@asynccontextmanager
+async def grading_session_async(questions, teacher_file):
+    name = None
+    try:
+        config = await asyncio.to_thread(_grading_cache_config, questions, teacher_file)
+        cache = await gateway.create_cache_async(COMPARE_MODEL, config)
+        name = cache.name
+    except Exception as e:
+        logger.warning(f"Grading cache unavailable, sending answer key inline: {e}")
+
+    try:
+        yield name
+    finally:
+        if name:
+            try:
+                await gateway.delete_cache_async(COMPARE_MODEL, name)
+            except Exception as e:
+                logger.warning(f"Error deleting grading cache {name}: {e}")
 
 
 # -------------------------------------------------------
@@ -176,15 +611,179 @@ def compute_topic_scores(results):
 
 
 # -------------------------------------------------------
-# Main pipeline
+# Single call: extract + compare in one structured request
 # -------------------------------------------------------
-def process_exam(question_pdf, teacher_ans, student_ans):
+EXAM_MODE_TWO_STEP = "two_step"
+EXAM_MODE_SINGLE = "single"
+EXAM_MODES = (EXAM_MODE_TWO_STEP, EXAM_MODE_SINGLE)
+
+COMBINED_RESULT_SCHEMA = types.Schema(
+    type=types.Type.ARRAY,
+    items=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "question_number": types.Schema(type=types.Type.INTEGER),
+            "question": types.Schema(type=types.Type.STRING),
+            "topic": types.Schema(type=types.Type.STRING),
+            "teacher_answer": types.Schema(type=types.Type.STRING),
+            "student_answer": types.Schema(type=types.Type.STRING),
+            "correct": types.Schema(type=types.Type.BOOLEAN)
+        },
+        required=["question_number", "question", "topic", "teacher_answer", "student_answer", "correct"],
+        property_ordering=["question_number", "question", "topic", "teacher_answer", "student_answer", "correct"]
+    )
+)
+
+COMBINED_PROMPT = """
+You are an expert educational examiner. You are given an exam paper, the
+TEACHER answer key and a STUDENT answer sheet.
+
+For every question in the exam paper return:
+- its question number and exact question text (NO rewriting)
+- the most specific curriculum-aligned topic/subtopic
+  (e.g. "Algebra — Linear Equations", "Grammar — Past Tense")
+- the teacher answer and the student answer for that question
+- correct: true if the answers are logically equivalent; false if wrong,
+  missing, empty, or ambiguous. Do NOT solve questions, only compare.
+"""
+
+
+def _combined_request(pdf_bytes, teacher_ans, student_ans):
+    return dict(
+        model=COMPARE_MODEL,
+        contents=[
+            types.Part(text=COMBINED_PROMPT),
+            types.Part(text="EXAM PAPER:"), *pdf_parts(pdf_bytes),
+            types.Part(text="TEACHER ANSWERS:"), *load_file(teacher_ans),
+            types.Part(text="STUDENT ANSWERS:"), *load_file(student_ans)
+        ],
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=COMBINED_RESULT_SCHEMA
+        )
+    )
+
+
+def _combined_key(pdf_bytes):
+    """Cache key for questions returned by the combined call (not the extraction prompt's key)"""
+    return ResultCache.make_key(pdf_bytes, COMBINED_PROMPT, COMPARE_MODEL)
+
+
+def _split_combined(pdf_bytes, items):
+    """Split combined rows into (questions, comparison), caching the questions under _combined_key"""
+    questions = [
+        {"number": item["question_number"], "question": item["question"], "topic": item["topic"]}
+        for item in items
+    ]
+    comparison = [
+        {key: item[key] for key in ("question_number", "topic", "teacher_answer", "student_answer", "correct")}
+        for item in items
+    ]
+
+    extraction_cache.set(_combined_key(pdf_bytes), questions)
+    return questions, comparison
+
+
+def _combined_exam(pdf_bytes, teacher_ans, student_ans):
+    response = gateway.generate(**_combined_request(pdf_bytes, teacher_ans, student_ans))
+
+    return _split_combined(pdf_bytes, json.loads(response.text))
+
+
+async def _combined_exam_async(pdf_bytes, teacher_ans, student_ans):
+    # Building the parts parses and splits the PDFs: keep it off the loop
+    request = await asyncio.to_thread(_combined_request, pdf_bytes, teacher_ans, student_ans)
+    response = await gateway.generate_async(**request)
+
+    return await asyncio.to_thread(_split_combined, pdf_bytes, json.loads(response.text))
+
+
+def _exam_mode(mode):
+    mode = mode or settings.EXAM_PIPELINE_MODE
+    if mode not in EXAM_MODES:
+        raise ValueError(f"Unknown exam mode {mode!r}, expected one of {EXAM_MODES}")
+    return mode
+
+
+def _page_count(pdf_bytes):
+    if pypdf is None:
+        return None
+    try:
+        return len(pypdf.PdfReader(io.BytesIO(pdf_bytes)).pages)
+    except Exception:
+        return None
+
+
+def _exam_plan(question_pdf, mode):
+    """
+    Decide how to grade one exam -> (pdf_bytes, questions, single).
+
+    questions are the paper's already-known questions (from the extraction
+    cache, or in single mode from an earlier combined call) or None.
+    single is True when the combined call should be used: single mode, no
+    known questions (comparing alone is then one call anyway) and a paper
+    no longer than EXTRACTION_CHUNK_PAGES, which would need chunking.
+    """
+    mode = _exam_mode(mode)
+    pdf_bytes, _, questions = _cached_extraction(question_pdf, use_cache=True)
+    if mode != EXAM_MODE_SINGLE:
+        return pdf_bytes, questions, False
+
+    if questions is None:
+        questions = extraction_cache.get(_combined_key(pdf_bytes))
+    if questions is not None:
+        return pdf_bytes, questions, False
+
+    pages = _page_count(pdf_bytes)
+    if pages and pages > settings.EXTRACTION_CHUNK_PAGES:
+        logger.info(f"📄 {pages}-page paper: using two-step mode so extraction can be chunked")
+        return pdf_bytes, None, False
+    return pdf_bytes, None, True
+
+
+def _exam_stages(question_pdf, teacher_ans, student_ans, mode=None):
+    """Yield ("questions", ...) then ("comparison", ...) for one student, per _exam_plan"""
+    pdf_bytes, questions, single = _exam_plan(question_pdf, mode)
+
+    if single:
+        logger.info("📄📝 Extracting and comparing in one request...")
+        questions, results = _combined_exam(pdf_bytes, teacher_ans, student_ans)
+        yield "questions", questions
+        yield "comparison", results
+        return
+
     logger.info("📄 Extracting questions...")
-    questions = extract_questions_with_topics(question_pdf)
+    if questions is None:
+        questions = extract_questions_with_topics(question_pdf)
+    yield "questions", questions
+
+    logger.info("📝 Comparing answers...")
+    yield "comparison", compare_answers(questions, teacher_ans, student_ans)
+
+
+async def _exam_stages_async(question_pdf, teacher_ans, student_ans, mode=None):
+    pdf_bytes, questions, single = await asyncio.to_thread(_exam_plan, question_pdf, mode)
+
+    if single:
+        logger.info("📄📝 Extracting and comparing in one request...")
+        questions, results = await _combined_exam_async(pdf_bytes, teacher_ans, student_ans)
+        yield "questions", questions
+        yield "comparison", results
+        return
+
+    logger.info("📄 Extracting questions...")
+    if questions is None:
+        questions = await extract_questions_with_topics_async(question_pdf)
+    yield "questions", questions
 
     logger.info("📝 Comparing answers...")
-    results = compare_answers(questions, teacher_ans, student_ans)
+    yield "comparison", await compare_answers_async(questions, teacher_ans, student_ans)
 
+
+# -------------------------------------------------------
+# Main pipeline
+# -------------------------------------------------------
+def _exam_result(questions, results):
     logger.info("📊 Computing topic performance...")
     stats = compute_topic_scores(results)
 
@@ -194,6 +793,98 @@ def process_exam(question_pdf, teacher_ans, student_ans):
         "topic_stats": stats
     }
 
+
+def process_exam(question_pdf, teacher_ans, student_ans, mode=None):
+    """
+    mode "two_step" (default, EXAM_PIPELINE_MODE) extracts questions and then
+    compares answers in separate calls; "single" does both in one structured
+    request, halving round-trips.
+
+    Single mode grades every question with Gemini (the LOCAL_GRADING pass
+    needs the questions first), and falls back to two-step when the paper's
+    questions are already known or it is long enough to need chunked
+    extraction.
+    """
+    stages = dict(_exam_stages(question_pdf, teacher_ans, student_ans, mode))
+
+    return _exam_result(stages["questions"], stages["comparison"])
+
+
+async def process_exam_async(question_pdf, teacher_ans, student_ans, mode=None):
+    stages = {name: data async for name, data in _exam_stages_async(question_pdf, teacher_ans, student_ans, mode)}
+
+    return _exam_result(stages["questions"], stages["comparison"])
+
+
+# -------------------------------------------------------
+# Class batch: one question paper + answer key, N students
+# -------------------------------------------------------
+def _student_result(student_ans, results):
+    return {
+        "student_answers": str(student_ans),
+        "comparison": results,
+        "topic_stats": compute_topic_scores(results)
+    }
+
+
+def _class_result(questions, students):
+    logger.info("📊 Computing class topic performance...")
+    class_results = [
+        item for student in students for item in student.get("comparison", [])
+    ]
+
+    return {
+        "questions": questions,
+        "students": students,
+        "class_topic_stats": compute_topic_scores(class_results)
+    }
+
+
+def process_class(question_pdf, teacher_ans, student_answers, max_concurrency=None):
+    max_concurrency = max_concurrency or settings.GRADING_CONCURRENCY
+
+    logger.info("📄 Extracting questions once for the class...")
+    questions = extract_questions_with_topics(question_pdf)
+
+    def grade(student_ans, cached_content):
+        try:
+            results = compare_answers(questions, teacher_ans, student_ans, cached_content)
+            return _student_result(student_ans, results)
+        except Exception as e:
+            logger.error(f"Error grading {student_ans}: {e}")
+            return {"student_answers": str(student_ans), "error": str(e)}
+
+    logger.info(f"📝 Comparing {len(student_answers)} answer sheets ({max_concurrency} at a time)...")
+    with grading_session(questions, teacher_ans) as cached_content:
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            students = list(pool.map(lambda s: grade(s, cached_content), student_answers))
+
+    return _class_result(questions, students)
+
+
+async def process_class_async(question_pdf, teacher_ans, student_answers, max_concurrency=None):
+    max_concurrency = max_concurrency or settings.GRADING_CONCURRENCY
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    logger.info("📄 Extracting questions once for the class...")
+    questions = await extract_questions_with_topics_async(question_pdf)
+
+    async def grade(student_ans, cached_content):
+        async with semaphore:
+            try:
+                results = await compare_answers_async(questions, teacher_ans, student_ans, cached_content)
+                return _student_result(student_ans, results)
+            except Exception as e:
+                logger.error(f"Error grading {student_ans}: {e}")
+                return {"student_answers": str(student_ans), "error": str(e)}
+
+    logger.info(f"📝 Comparing {len(student_answers)} answer sheets ({max_concurrency} at a time)...")
+    async with grading_session_async(questions, teacher_ans) as cached_content:
+        students = await asyncio.gather(*(grade(s, cached_content) for s in student_answers))
+
+    return _class_result(questions, list(students))
+
+
 def find_strongest_and_weakest_topic(topic_stats):
     results = []
     for topic, data in topic_stats.items():
@@ -209,10 +900,25 @@ def find_strongest_and_weakest_topic(topic_stats):
     }
 
 
-def generate_learning_plan(topic):
+def find_weakest_topics(topic_stats, k):
+    """Return up to k topics, lowest accuracy first"""
+    ranked = sorted(
+        topic_stats,
+        key=lambda t: topic_stats[t]["correct"] / ((topic_stats[t]["correct"] + topic_stats[t]["incorrect"]) or 1)
+    )
+    return ranked[:k]
+
+
+def _learning_plan_request(topic, grade="", curriculum=""):
+    audience = ""
+    if grade:
+        audience += f"\n    GRADE: {grade}"
+    if curriculum:
+        audience += f"\n    CURRICULUM: {curriculum}"
+
     prompt = f"""
     You are an expert educator. Create a detailed learning plan to improve:
-    TOPIC: {topic}
+    TOPIC: {topic}{audience}
 
     Include:
     - Learning objectives
@@ -225,21 +931,311 @@ def generate_learning_plan(topic):
     - A short quiz (3 questions)
     """
 
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
+    return dict(
+        model=PLAN_MODEL,
         contents=[types.Part(text=prompt)]
     )
 
+
+def normalize_topic(topic):
+    """Fold case, dashes and whitespace so "Algebra – Linear Equations" and "algebra - linear  equations" match"""
+    topic = re.sub(r"\s*[-\u2010-\u2015]\s*", " - ", str(topic).casefold())
+    return " ".join(topic.split())
+
+
+def _plan_key(topic, grade, curriculum):
+    return plan_cache.make_key(
+        PLAN_MODEL, normalize_topic(topic), normalize_topic(grade), normalize_topic(curriculum)
+    )
+
+
+def generate_learning_plan(topic, grade="", curriculum="", use_cache=True):
+    key = _plan_key(topic, grade, curriculum)
+    if use_cache:
+        cached = plan_cache.get(key)
+        if cached is not None:
+            logger.info(f"📚 Learning plan cache hit for {topic}")
+            return cached
+
+    response = gateway.generate(**_learning_plan_request(topic, grade, curriculum))
+
+    if response.text:
+        plan_cache.set(key, response.text)
     return response.text
 
-def process_exam_full(q_pdf, t_ans, s_ans):
-    base = process_exam(q_pdf, t_ans, s_ans)
 
-    topics = find_strongest_and_weakest_topic(base["topic_stats"])
-    learning_plan = generate_learning_plan(topics["weakest_topic"])
+async def generate_learning_plan_async(topic, grade="", curriculum="", use_cache=True):
+    key = _plan_key(topic, grade, curriculum)
+    if use_cache:
+        cached = plan_cache.get(key)
+        if cached is not None:
+            logger.info(f"📚 Learning plan cache hit for {topic}")
+            return cached
+
+    response = await gateway.generate_async(**_learning_plan_request(topic, grade, curriculum))
+
+    if response.text:
+        plan_cache.set(key, response.text)
+    return response.text
+
+
+async def stream_learning_plan_async(topic, grade="", curriculum=""):
+    """Yield the learning plan text as it is generated (all at once on a cache hit)"""
+    key = _plan_key(topic, grade, curriculum)
+    cached = plan_cache.get(key)
+    if cached is not None:
+        logger.info(f"📚 Learning plan cache hit for {topic}")
+        yield cached
+        return
 
+    chunks = []
+    async for chunk in gateway.stream_async(**_learning_plan_request(topic, grade, curriculum)):
+        if chunk.text:
+            chunks.append(chunk.text)
+            yield chunk.text
+
+    if chunks:
+        plan_cache.set(key, "".join(chunks))
+
+
+# -------------------------------------------------------
+# Learning plans for a ranked list of topics
+# -------------------------------------------------------
+def _unique_topics(topics):
+    """Keep the first spelling of each normalized topic, preserving rank order"""
+    unique = {}
+    for topic in topics:
+        unique.setdefault(normalize_topic(topic), topic)
+    return list(unique.values())
+
+
+def _ranked_plans(topics, plans_by_topic):
+    return [
+        {"topic": topic, "learning_plan": plans_by_topic.get(normalize_topic(topic))}
+        for topic in topics
+    ]
+
+
+def generate_learning_plans(topics, grade="", curriculum="", max_concurrency=None):
+    """
+    Learning plans for a ranked list of weak topics. Cached plans are served
+    straight from plan_cache; only the missing topics are generated, up to
+    max_concurrency at a time. Returns [{"topic", "learning_plan"}] in the
+    input order, with learning_plan None for topics whose generation failed.
+    """
+    max_concurrency = max_concurrency or settings.PLAN_CONCURRENCY
+
+    def generate(topic):
+        try:
+            return generate_learning_plan(topic, grade, curriculum)
+        except Exception as e:
+            logger.error(f"Error generating learning plan for {topic}: {e}")
+            return None
+
+    unique = _unique_topics(topics)
+    plans = {}
+    missing = []
+    for topic in unique:
+        cached = plan_cache.get(_plan_key(topic, grade, curriculum))
+        if cached is None:
+            missing.append(topic)
+        else:
+            plans[normalize_topic(topic)] = cached
+
+    if missing:
+        logger.info(f"📚 Generating {len(missing)} of {len(unique)} learning plans ({max_concurrency} at a time)...")
+        with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+            for topic, plan in zip(missing, pool.map(generate, missing)):
+                plans[normalize_topic(topic)] = plan
+
+    return _ranked_plans(topics, plans)
+
+
+async def generate_learning_plans_async(topics, grade="", curriculum="", max_concurrency=None):
+    max_concurrency = max_concurrency or settings.PLAN_CONCURRENCY
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def generate(topic):
+        async with semaphore:
+            try:
+                return await generate_learning_plan_async(topic, grade, curriculum)
+            except Exception as e:
+                logger.error(f"Error generating learning plan for {topic}: {e}")
+                return None
+
+    unique = _unique_topics(topics)
+    plans = {}
+    missing = []
+    for topic in unique:
+        cached = plan_cache.get(_plan_key(topic, grade, curriculum))
+        if cached is None:
+            missing.append(topic)
+        else:
+            plans[normalize_topic(topic)] = cached
+
+    if missing:
+        logger.info(f"📚 Generating {len(missing)} of {len(unique)} learning plans ({max_concurrency} at a time)...")
+        generated = await asyncio.gather(*(generate(t) for t in missing))
+        for topic, plan in zip(missing, generated):
+            plans[normalize_topic(topic)] = plan
+
+    return _ranked_plans(topics, plans)
+
+
+# -------------------------------------------------------
+# Structured lesson plans (validate into models.lesson_plan.LessonPlan)
+# -------------------------------------------------------
+_STRING_LIST = types.Schema(type=types.Type.ARRAY, items=types.Schema(type=types.Type.STRING))
+
+LESSON_PLAN_SCHEMA = types.Schema(
+    type=types.Type.ARRAY,
+    items=types.Schema(
+        type=types.Type.OBJECT,
+        properties={
+            "topic": types.Schema(type=types.Type.STRING),
+            "objectives": _STRING_LIST,
+            "activities": _STRING_LIST,
+            "assessments": _STRING_LIST
+        },
+        required=["topic", "objectives", "activities", "assessments"],
+        property_ordering=["topic", "objectives", "activities", "assessments"]
+    )
+)
+
+
+def _structured_plans_request(topics):
+    topic_list = "\n".join(f"- {topic}" for topic in topics)
+    prompt = f"""
+    You are an expert educator. Students performed poorly on the topics below.
+    Create one focused learning plan for EACH topic.
+
+    TOPICS:
+    {topic_list}
+
+    For every topic return:
+    - topic: the topic name exactly as given
+    - objectives: 3-5 measurable learning objectives
+    - activities: step-by-step teaching strategies, 2 classroom activities and 1 homework activity
+    - assessments: a short quiz (3 questions) and checks for common student errors
+    """
+
+    return dict(
+        model=PLAN_MODEL,
+        contents=[types.Part(text=prompt)],
+        config=types.GenerateContentConfig(
+            response_mime_type="application/json",
+            response_schema=LESSON_PLAN_SCHEMA
+        )
+    )
+
+
+def _to_lesson_plans(topics, items):
+    plans = {}
+    for item in items:
+        plans[item["topic"]] = LessonPlan(
+            topic=item["topic"],
+            objectives=list(item["objectives"]),
+            activities=list(item["activities"]),
+            assessments=list(item["assessments"])
+        )
+
+    missing = [topic for topic in topics if topic not in plans]
+    if missing:
+        logger.warning(f"No structured plan returned for: {missing}")
+    return [plans[topic] for topic in topics if topic in plans]
+
+
+def generate_structured_lesson_plans(topics):
+    """Generate LessonPlan objects for several topics in a single call"""
+    if not topics:
+        return []
+    response = gateway.generate(**_structured_plans_request(topics))
+
+    return _to_lesson_plans(topics, json.loads(response.text))
+
+
+async def generate_structured_lesson_plans_async(topics):
+    if not topics:
+        return []
+    response = await gateway.generate_async(**_structured_plans_request(topics))
+
+    return _to_lesson_plans(topics, json.loads(response.text))
+
+
+def _add_plan(base, topics, learning_plan):
     base["weakest_topic"] = topics["weakest_topic"]
     base["strongest_topic"] = topics["strongest_topic"]
     base["learning_plan"] = learning_plan
 
     return base
+
+
+def process_exam_full(q_pdf, t_ans, s_ans, weakest_k=None, mode=None):
+    """
+    With weakest_k, returns structured "lesson_plans" for the k weakest
+    topics (one call) instead of a markdown "learning_plan". mode is passed
+    to process_exam.
+    """
+    base = process_exam(q_pdf, t_ans, s_ans, mode)
+
+    topics = find_strongest_and_weakest_topic(base["topic_stats"])
+    if weakest_k:
+        plans = generate_structured_lesson_plans(find_weakest_topics(base["topic_stats"], weakest_k))
+        base["lesson_plans"] = [plan.to_dict() for plan in plans]
+        return _add_plan(base, topics, None)
+
+    learning_plan = generate_learning_plan(topics["weakest_topic"])
+
+    return _add_plan(base, topics, learning_plan)
+
+
+async def process_exam_full_async(q_pdf, t_ans, s_ans, weakest_k=None, mode=None):
+    base = await process_exam_async(q_pdf, t_ans, s_ans, mode)
+
+    topics = find_strongest_and_weakest_topic(base["topic_stats"])
+    if weakest_k:
+        plans = await generate_structured_lesson_plans_async(find_weakest_topics(base["topic_stats"], weakest_k))
+        base["lesson_plans"] = [plan.to_dict() for plan in plans]
+        return _add_plan(base, topics, None)
+
+    learning_plan = await generate_learning_plan_async(topics["weakest_topic"])
+
+    return _add_plan(base, topics, learning_plan)
+
+
+# -------------------------------------------------------
+# Streaming: stage events for process_exam_full
+# -------------------------------------------------------
+def _event(name, data):
+    return {"event": name, "data": data}
+
+
+async def process_exam_full_events(q_pdf, t_ans, s_ans, mode=None):
+    """
+    Async generator behind the SSE endpoint. Yields {"event", "data"} as each
+    stage of process_exam_full finishes: questions_extracted,
+    comparison_done, topic_stats, weakest_topic, then plan_token per chunk of
+    the learning plan and finally done with the same result as
+    process_exam_full_async.
+    """
+    stages = {}
+    async for name, data in _exam_stages_async(q_pdf, t_ans, s_ans, mode):
+        stages[name] = data
+        if name == "questions":
+            yield _event("questions_extracted", {"questions": data})
+        else:
+            yield _event("comparison_done", {"comparison": data})
+
+    base = _exam_result(stages["questions"], stages["comparison"])
+    yield _event("topic_stats", {"topic_stats": base["topic_stats"]})
+
+    topics = find_strongest_and_weakest_topic(base["topic_stats"])
+    yield _event("weakest_topic", topics)
+
+    plan = []
+    async for text in stream_learning_plan_async(topics["weakest_topic"]):
+        plan.append(text)
+        yield _event("plan_token", {"text": text})
+
+    yield _event("done", _add_plan(base, topics, "".join(plan)))
+
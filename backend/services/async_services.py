@@ -0,0 +1,243 @@
+import asyncio
+from firebase_admin import firestore
+from core.firebase_client import async_db
+from services.list_cache import list_cache
+from services.pagination import list_page_async
+from services.teacher_service import TeacherService
+from services.performance_service import PerformanceService
+from services.lesson_plan_service import LessonPlanService
+from services.recommendation_service import RecommendationService
+from services.weak_area_service import WeakAreaService
+from services.upload_service import UploadService
+from services.test_paper_service import TestPaperService
+from services.syllabus_service import SyllabusService
+from utils.app_logger import logger
+
+# Awaitable versions of the Firestore services for the FastAPI handlers.
+#
+# With FIRESTORE_ASYNC enabled every call goes through firestore.AsyncClient.
+# Otherwise the matching synchronous service method runs on a worker thread,
+# so either way the event loop is never blocked by a Firestore RPC.
+
+
+def _subcollection(teacher_id: str, collection: str):
+    return async_db.collection("teachers").document(teacher_id).collection(collection)
+
+
+async def _add(teacher_id: str, collection: str, obj, label: str, doc_id: str = None, overview_counters: dict = None,
+               merge: bool = False):
+    try:
+        doc_ref = _subcollection(teacher_id, collection).document(doc_id)
+        if overview_counters:
+            # Same batch as the new document, as in the sync services
+            batch = async_db.batch()
+            batch.set(doc_ref, obj.to_dict())
+            batch.set(_subcollection(teacher_id, "performance").document("overview"),
+                      PerformanceService.overview_changes(counters=overview_counters), merge=True)
+            await batch.commit()
+        else:
+            await doc_ref.set(obj.to_dict(), merge=merge)
+        list_cache.invalidate(teacher_id, collection)
+        return doc_ref.id
+    except Exception as e:
+        logger.error(f"Error adding {label}: {e}")
+        return None
+
+
+async def _save(teacher_id: str, collection: str, doc_id: str, obj, label: str, overview_counter: str = None):
+    try:
+        doc_ref = _subcollection(teacher_id, collection).document(doc_id)
+        if overview_counter:
+            # Same as PerformanceService.upsert_counted: bump the counter
+            # only when this upsert creates the document
+            @firestore.async_transactional
+            async def write(transaction):
+                created = not (await doc_ref.get(transaction=transaction)).exists
+                transaction.set(doc_ref, obj.to_dict(), merge=True)
+                if created:
+                    transaction.set(_subcollection(teacher_id, "performance").document("overview"),
+                                    PerformanceService.overview_changes(counters={overview_counter: 1}), merge=True)
+
+            await write(async_db.transaction())
+        else:
+            await doc_ref.set(obj.to_dict(), merge=True)
+        list_cache.invalidate(teacher_id, collection)
+    except Exception as e:
+        logger.error(f"Error saving {label}: {e}")
+
+
+async def _list(teacher_id: str, collection: str, label: str, limit=None, start_after=None, fields=None):
+    async def load():
+        return [d.to_dict() async for d in _subcollection(teacher_id, collection).stream()]
+
+    try:
+        if limit or start_after or fields:
+            return await list_page_async(_subcollection(teacher_id, collection), limit, start_after, fields)
+        return await list_cache.get_or_load_async(teacher_id, collection, load)
+    except Exception as e:
+        logger.error(f"Error listing {label}: {e}")
+        return []
+
+
+class AsyncTeacherService:
+
+    @staticmethod
+    async def get_teacher(teacher_id: str):
+        if async_db is None:
+            return await asyncio.to_thread(TeacherService.get_teacher, teacher_id)
+        try:
+            doc = await async_db.collection("teachers").document(teacher_id).get()
+            return doc.to_dict()
+        except Exception as e:
+            logger.error(f"Error fetching teacher: {e}")
+            return None
+
+    @staticmethod
+    async def save_teacher(teacher_obj):
+        if async_db is None:
+            return await asyncio.to_thread(TeacherService.save_teacher, teacher_obj)
+        try:
+            doc_ref = async_db.collection("teachers").document()
+            await doc_ref.set(teacher_obj.to_dict())
+            return doc_ref.id
+        except Exception as e:
+            logger.error(f"Error saving teacher: {e}")
+            return None
+
+    @staticmethod
+    async def update_field(teacher_id: str, field: str, value):
+        if async_db is None:
+            return await asyncio.to_thread(TeacherService.update_field, teacher_id, field, value)
+        try:
+            await async_db.collection("teachers").document(teacher_id).update({field: value})
+        except Exception as e:
+            logger.error(f"Error updating field: {e}")
+
+
+class AsyncPerformanceService:
+
+    @staticmethod
+    async def save_overview(teacher_id: str, overview_obj):
+        if async_db is None:
+            return await asyncio.to_thread(PerformanceService.save_overview, teacher_id, overview_obj)
+        try:
+            await _subcollection(teacher_id, "performance").document("overview")\
+                .set(PerformanceService.editable_fields(overview_obj), merge=True)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving performance overview: {e}")
+            logger.exception("Full error details:")
+            return False
+
+    @staticmethod
+    async def get_overview(teacher_id: str):
+        if async_db is None:
+            return await asyncio.to_thread(PerformanceService.get_overview, teacher_id)
+        try:
+            doc = await _subcollection(teacher_id, "performance").document("overview").get()
+            return doc.to_dict()
+        except Exception as e:
+            logger.error(f"Error fetching performance overview: {e}")
+            return None
+
+
+class AsyncLessonPlanService:
+
+    @staticmethod
+    async def save_lesson_plan(teacher_id: str, plan_id: str, lesson_obj):
+        if async_db is None:
+            return await asyncio.to_thread(LessonPlanService.save_lesson_plan, teacher_id, plan_id, lesson_obj)
+        await _save(teacher_id, "lessonPlans", plan_id, lesson_obj, "lesson plan")
+
+    @staticmethod
+    async def add_lesson_plan(teacher_id: str, lesson_obj):
+        if async_db is None:
+            return await asyncio.to_thread(LessonPlanService.add_lesson_plan, teacher_id, lesson_obj)
+        return await _add(teacher_id, "lessonPlans", lesson_obj, "lesson plan")
+
+    @staticmethod
+    async def list_lesson_plans(teacher_id: str, limit: int = None, start_after: str = None, fields: list = None):
+        if async_db is None:
+            return await asyncio.to_thread(LessonPlanService.list_lesson_plans, teacher_id, limit, start_after, fields)
+        return await _list(teacher_id, "lessonPlans", "lesson plans", limit, start_after, fields)
+
+
+class AsyncRecommendationService:
+
+    @staticmethod
+    async def save_recommendation(teacher_id: str, rec_id: str, rec_obj):
+        if async_db is None:
+            return await asyncio.to_thread(RecommendationService.save_recommendation, teacher_id, rec_id, rec_obj)
+        await _save(teacher_id, "recommendations", rec_id, rec_obj, "recommendation",
+                    overview_counter="recommendations_count")
+
+    @staticmethod
+    async def add_recommendation(teacher_id: str, rec_obj):
+        if async_db is None:
+            return await asyncio.to_thread(RecommendationService.add_recommendation, teacher_id, rec_obj)
+        return await _add(teacher_id, "recommendations", rec_obj, "recommendation",
+                          overview_counters={"recommendations_count": 1})
+
+    @staticmethod
+    async def list_recommendations(teacher_id: str, limit: int = None, start_after: str = None, fields: list = None):
+        if async_db is None:
+            return await asyncio.to_thread(RecommendationService.list_recommendations, teacher_id, limit, start_after, fields)
+        return await _list(teacher_id, "recommendations", "recommendations", limit, start_after, fields)
+
+
+class AsyncWeakAreaService:
+
+    @staticmethod
+    async def save_weak_area(teacher_id: str, topic_id: str, weak_obj):
+        if async_db is None:
+            return await asyncio.to_thread(WeakAreaService.save_weak_area, teacher_id, topic_id, weak_obj)
+        await _save(teacher_id, "weakAreas", topic_id, weak_obj, "weak area",
+                    overview_counter="weak_areas_count")
+
+    @staticmethod
+    async def add_weak_area(teacher_id: str, weak_obj):
+        if async_db is None:
+            return await asyncio.to_thread(WeakAreaService.add_weak_area, teacher_id, weak_obj)
+        return await _add(teacher_id, "weakAreas", weak_obj, "weak area",
+                          overview_counters={"weak_areas_count": 1})
+
+    @staticmethod
+    async def list_weak_areas(teacher_id: str, limit: int = None, start_after: str = None, fields: list = None):
+        if async_db is None:
+            return await asyncio.to_thread(WeakAreaService.list_weak_areas, teacher_id, limit, start_after, fields)
+        return await _list(teacher_id, "weakAreas", "weak areas", limit, start_after, fields)
+
+
+class AsyncUploadService:
+
+    @staticmethod
+    async def add_upload(teacher_id: str, upload_obj):
+        if async_db is None:
+            return await asyncio.to_thread(UploadService.add_upload, teacher_id, upload_obj)
+        file_hash = getattr(upload_obj, "file_hash", None)
+        doc_id = f"{upload_obj.file_type}_{file_hash}" if file_hash else None
+        return await _add(teacher_id, "uploads", upload_obj, "upload", doc_id, merge=True)
+
+    @staticmethod
+    async def list_uploads(teacher_id: str, limit: int = None, start_after: str = None, fields: list = None):
+        if async_db is None:
+            return await asyncio.to_thread(UploadService.list_uploads, teacher_id, limit, start_after, fields)
+        return await _list(teacher_id, "uploads", "uploads", limit, start_after, fields)
+
+
+class AsyncTestPaperService:
+
+    @staticmethod
+    async def list_test_papers(teacher_id: str, limit: int = None, start_after: str = None, fields: list = None):
+        if async_db is None:
+            return await asyncio.to_thread(TestPaperService.list_test_papers, teacher_id, limit, start_after, fields)
+        return await _list(teacher_id, "testPapers", "test papers", limit, start_after, fields)
+
+
+class AsyncSyllabusService:
+
+    @staticmethod
+    async def list_syllabi(teacher_id: str, limit: int = None, start_after: str = None, fields: list = None):
+        if async_db is None:
+            return await asyncio.to_thread(SyllabusService.list_syllabi, teacher_id, limit, start_after, fields)
+        return await _list(teacher_id, "syllabi", "syllabi", limit, start_after, fields)
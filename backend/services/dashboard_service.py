@@ -0,0 +1,32 @@
+import asyncio
+import hashlib
+import json
+from services.async_services import (
+    AsyncTeacherService, AsyncPerformanceService, AsyncLessonPlanService, AsyncRecommendationService,
+    AsyncWeakAreaService, AsyncUploadService, AsyncTestPaperService, AsyncSyllabusService
+)
+
+class DashboardService:
+
+    @staticmethod
+    async def get_dashboard_async(teacher_id: str):
+        """Fetch the teacher, performance overview and every list subcollection concurrently"""
+        sources = {
+            "teacher": AsyncTeacherService.get_teacher,
+            "overview": AsyncPerformanceService.get_overview,
+            "lesson_plans": AsyncLessonPlanService.list_lesson_plans,
+            "recommendations": AsyncRecommendationService.list_recommendations,
+            "weak_areas": AsyncWeakAreaService.list_weak_areas,
+            "uploads": AsyncUploadService.list_uploads,
+            "test_papers": AsyncTestPaperService.list_test_papers,
+            "syllabi": AsyncSyllabusService.list_syllabi
+        }
+        results = await asyncio.gather(*(fetch(teacher_id) for fetch in sources.values()))
+        return dict(zip(sources.keys(), results))
+
+    @staticmethod
+    def serialize(dashboard: dict):
+        """Return the dashboard as canonical JSON and a strong ETag for it"""
+        body = json.dumps(dashboard, sort_keys=True, default=str)
+        etag = f'"{hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]}"'
+        return body, etag
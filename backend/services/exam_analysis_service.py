@@ -0,0 +1,194 @@
+import hashlib
+import re
+from datetime import datetime
+from firebase_admin import firestore
+from core.firebase_client import db
+from models.lesson_plan import LessonPlan
+from models.weak_area import WeakArea
+from services.lesson_plan_service import LessonPlanService
+from services.list_cache import list_cache
+from services.performance_service import PerformanceService
+from services.weak_area_service import WeakAreaService
+from utils.app_logger import logger
+
+class ExamAnalysisService:
+
+    @staticmethod
+    def topic_id(topic: str) -> str:
+        """Stable Firestore document ID for a topic name"""
+        slug = re.sub(r"[^a-z0-9]+", "-", topic.lower()).strip("-")
+        return slug[:120] or hashlib.sha1(topic.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def topic_mastery(topic_stats: dict) -> dict:
+        """Map each topic to its percentage of correct answers"""
+        mastery = {}
+        for topic, data in topic_stats.items():
+            total = data["correct"] + data["incorrect"]
+            mastery[topic] = round(100 * data["correct"] / total) if total else 0
+        return mastery
+
+    @staticmethod
+    def difficulty(mastery: int) -> str:
+        if mastery < 50:
+            return "hard"
+        if mastery < 75:
+            return "medium"
+        return "easy"
+
+    @staticmethod
+    def is_weak(mastery: int) -> bool:
+        """Topics a teacher still needs to work on, i.e. not "easy" (< 75%)"""
+        return ExamAnalysisService.difficulty(mastery) != "easy"
+
+    @staticmethod
+    def merge_mastery(previous: dict, score: int):
+        """Running average of a topic's mastery across analyzed papers -> (mastery, samples)"""
+        if not previous:
+            return score, 1
+        samples = previous.get("samples") or 1
+        mastery = round((previous.get("mastery", score) * samples + score) / (samples + 1))
+        return mastery, samples + 1
+
+    @staticmethod
+    def unmerge_mastery(previous: dict, score: int):
+        """
+        Take one paper's score back out of a running average. Returns the
+        remaining (mastery, samples), or None if it was the only sample.
+        """
+        samples = previous.get("samples") or 1
+        if samples <= 1:
+            return None
+        mastery = round((previous.get("mastery", score) * samples - score) / (samples - 1))
+        return min(100, max(0, mastery)), samples - 1
+
+    @staticmethod
+    def save_analysis(teacher_id: str, test_paper_id: str, analysis: dict, inputs: dict = None) -> bool:
+        """
+        Write a process_exam_full result back in one transaction: the
+        questions and results onto the test paper, per-topic mastery into
+        weakAreas and the learning plan into lessonPlans.
+
+        A topic's mastery is averaged with its previous value. The paper's
+        own per-topic scores are stored with its analysis, so re-saving a
+        paper (reanalyze, changed inputs) replaces its earlier contribution
+        instead of counting the paper again. Only topics still below 75%
+        are kept in weakAreas; topics that are no longer weak are removed,
+        and weak_areas_count is adjusted to match.
+        Returns False if the test paper does not exist.
+        """
+        teacher_ref = db.collection("teachers").document(teacher_id)
+        paper_ref = teacher_ref.collection("testPapers").document(test_paper_id)
+        now = datetime.now().isoformat()
+        mastery = ExamAnalysisService.topic_mastery(analysis["topic_stats"])
+
+        stored = {
+            "comparison": analysis["comparison"],
+            "topic_stats": analysis["topic_stats"],
+            "weakest_topic": analysis.get("weakest_topic"),
+            "strongest_topic": analysis.get("strongest_topic"),
+            "learning_plan": analysis.get("learning_plan"),
+            "topic_mastery": mastery,
+            "inputs": inputs or {},
+            "analyzed_at": now
+        }
+        if "lesson_plans" in analysis:
+            stored["lesson_plans"] = analysis["lesson_plans"]
+
+        weakest = analysis.get("weakest_topic")
+        plans = [LessonPlan(**{**plan, "created_at": now}) for plan in analysis.get("lesson_plans") or []]
+        if weakest and analysis.get("learning_plan"):
+            plans.append(LessonPlan(weakest, [], [], [], created_at=now, content=analysis["learning_plan"]))
+
+        @firestore.transactional
+        def write(transaction):
+            # All reads happen before any write, as transactions require
+            paper = paper_ref.get(transaction=transaction)
+            if not paper.exists:
+                return False
+            # This paper's scores from an earlier save, already in the averages
+            counted = ((paper.to_dict() or {}).get("analysis") or {}).get("topic_mastery") or {}
+            weak_refs = {
+                topic: teacher_ref.collection("weakAreas").document(ExamAnalysisService.topic_id(topic))
+                for topic in {**counted, **mastery}
+            }
+            previous = {
+                snap.id: snap.to_dict()
+                for snap in db.get_all(list(weak_refs.values()), transaction=transaction)
+                if snap.exists
+            }
+
+            transaction.update(paper_ref, {
+                "extracted_questions": analysis["questions"],
+                "mapped_topics": sorted(mastery),
+                "status": "analyzed",
+                "analysis": stored
+            })
+
+            count_change = 0
+            for topic, ref in weak_refs.items():
+                current = previous.get(ref.id)
+                if current and topic in counted:
+                    remaining = ExamAnalysisService.unmerge_mastery(current, counted[topic])
+                    current = {**current, "mastery": remaining[0], "samples": remaining[1]} if remaining else None
+                if topic in mastery:
+                    merged, samples = ExamAnalysisService.merge_mastery(current, mastery[topic])
+                elif current:
+                    merged, samples = current["mastery"], current["samples"]
+                else:
+                    merged = samples = None
+
+                if merged is not None and ExamAnalysisService.is_weak(merged):
+                    weak_obj = WeakArea(topic, merged, ExamAnalysisService.difficulty(merged),
+                                        last_updated=now, samples=samples)
+                    WeakAreaService.save_weak_area(teacher_id, ref.id, weak_obj, batch=transaction)
+                    count_change += ref.id not in previous
+                elif ref.id in previous:
+                    transaction.delete(ref)
+                    count_change -= 1
+            if count_change:
+                PerformanceService.update_overview(
+                    teacher_id, counters={"weak_areas_count": count_change}, batch=transaction
+                )
+
+            for plan in plans:
+                plan_id = f"{test_paper_id}_{ExamAnalysisService.topic_id(plan.topic)}"
+                LessonPlanService.save_lesson_plan(teacher_id, plan_id, plan, batch=transaction)
+            return True
+
+        try:
+            saved = write(db.transaction())
+            if not saved:
+                logger.error(f"Test paper {test_paper_id} not found, analysis not saved")
+                return False
+            for collection in ("testPapers", "weakAreas", "lessonPlans"):
+                list_cache.invalidate(teacher_id, collection)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving exam analysis: {e}")
+            logger.exception("Full error details:")
+            return False
+
+    @staticmethod
+    def get_analysis(teacher_id: str, test_paper_id: str, inputs: dict = None):
+        """
+        Return the stored analysis for a test paper in process_exam_full's
+        shape, or None if it has not been analyzed with these inputs.
+        """
+        try:
+            doc = db.collection("teachers").document(teacher_id)\
+                .collection("testPapers").document(test_paper_id).get()
+            paper = doc.to_dict() if doc.exists else None
+            if not paper or paper.get("status") != "analyzed":
+                return None
+
+            analysis = dict(paper.get("analysis") or {})
+            stored_inputs = analysis.pop("inputs", None)
+            analysis.pop("analyzed_at", None)
+            analysis.pop("topic_mastery", None)
+            if inputs is not None and stored_inputs != inputs:
+                return None
+            return {"questions": paper.get("extracted_questions", []), **analysis}
+        except Exception as e:
+            logger.error(f"Error fetching exam analysis: {e}")
+            return None
@@ -0,0 +1,144 @@
+import asyncio
+import json
+import sqlite3
+import uuid
+from contextlib import closing, contextmanager
+from datetime import datetime
+from config.settings import settings
+from utils.app_logger import logger
+
+class JobService:
+    """
+    Background jobs persisted to SQLite and run by a bounded pool of
+    asyncio workers. Jobs that were queued or running when the process
+    stopped are picked up again on the next start().
+    """
+
+    _handlers = {}
+    _queue = None
+    _workers = []
+
+    @staticmethod
+    @contextmanager
+    def _connect():
+        """
+        Connection for one unit of work: committed (or rolled back) and then
+        closed on exit. sqlite3's own context manager only does the former.
+        """
+        with closing(sqlite3.connect(settings.JOB_DB_PATH)) as conn:
+            conn.row_factory = sqlite3.Row
+            with conn:
+                yield conn
+
+    @staticmethod
+    def init_db():
+        with JobService._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+
+    @staticmethod
+    def register_handler(kind: str, handler):
+        """Register the coroutine function that runs jobs of this kind"""
+        JobService._handlers[kind] = handler
+
+    @staticmethod
+    async def start(workers: int = None):
+        workers = workers or settings.JOB_WORKERS
+        JobService.init_db()
+        JobService._queue = asyncio.Queue()
+
+        with JobService._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'",
+                (datetime.now().isoformat(),)
+            )
+            pending = conn.execute(
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at"
+            ).fetchall()
+
+        for row in pending:
+            JobService._queue.put_nowait(row["id"])
+        if pending:
+            logger.info(f"Resuming {len(pending)} unfinished jobs")
+
+        JobService._workers = [
+            asyncio.create_task(JobService._worker()) for _ in range(workers)
+        ]
+        logger.info(f"Job workers started: {workers}")
+
+    @staticmethod
+    async def stop():
+        for task in JobService._workers:
+            task.cancel()
+        await asyncio.gather(*JobService._workers, return_exceptions=True)
+        JobService._workers = []
+
+    @staticmethod
+    def submit(kind: str, payload: dict) -> str:
+        """Persist a new job, queue it and return its ID"""
+        if kind not in JobService._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        with JobService._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, created_at, updated_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), now, now)
+            )
+        JobService._queue.put_nowait(job_id)
+        return job_id
+
+    @staticmethod
+    def get_job(job_id: str):
+        with JobService._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    @staticmethod
+    def _update(job_id: str, status: str, result=None, error: str = None):
+        with JobService._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, json.dumps(result) if result is not None else None, error,
+                 datetime.now().isoformat(), job_id)
+            )
+
+    @staticmethod
+    async def _worker():
+        while True:
+            job_id = await JobService._queue.get()
+            try:
+                job = JobService.get_job(job_id)
+                if job is None or job["status"] != "queued":
+                    continue
+
+                JobService._update(job_id, "running")
+                handler = JobService._handlers[job["kind"]]
+                result = await handler(**job["payload"])
+                JobService._update(job_id, "done", result=result)
+                logger.info(f"Job {job_id} finished")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {e}")
+                JobService._update(job_id, "failed", error=str(e))
+            finally:
+                JobService._queue.task_done()
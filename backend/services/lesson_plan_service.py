@@ -1,35 +1,52 @@
 from core.firebase_client import db
+from services.list_cache import list_cache
+from services.pagination import list_page
 from utils.app_logger import logger
 
 class LessonPlanService:
 
     @staticmethod
-    def save_lesson_plan(teacher_id: str, plan_id: str, lesson_obj):
+    def save_lesson_plan(teacher_id: str, plan_id: str, lesson_obj, batch=None):
         try:
-            db.collection("teachers").document(teacher_id)\
-                .collection("lessonPlans").document(plan_id)\
-                .set(lesson_obj.to_dict(), merge=True)
+            doc_ref = db.collection("teachers").document(teacher_id)\
+                .collection("lessonPlans").document(plan_id)
+            if batch is not None:
+                batch.set(doc_ref, lesson_obj.to_dict(), merge=True)
+            else:
+                doc_ref.set(lesson_obj.to_dict(), merge=True)
+                list_cache.invalidate(teacher_id, "lessonPlans")
         except Exception as e:
             logger.error(f"Error saving lesson plan: {e}")
 
     @staticmethod
-    def add_lesson_plan(teacher_id: str, lesson_obj):
+    def add_lesson_plan(teacher_id: str, lesson_obj, batch=None):
         """Add a lesson plan with auto-generated ID and return the ID"""
         try:
             doc_ref = db.collection("teachers").document(teacher_id)\
                 .collection("lessonPlans").document()
-            doc_ref.set(lesson_obj.to_dict())
+            if batch is not None:
+                batch.set(doc_ref, lesson_obj.to_dict())
+            else:
+                doc_ref.set(lesson_obj.to_dict())
+                list_cache.invalidate(teacher_id, "lessonPlans")
             return doc_ref.id
         except Exception as e:
             logger.error(f"Error adding lesson plan: {e}")
             return None
 
     @staticmethod
-    def list_lesson_plans(teacher_id: str):
-        try:
+    def list_lesson_plans(teacher_id: str, limit: int = None, start_after: str = None, fields: list = None):
+        def load():
             docs = db.collection("teachers").document(teacher_id)\
                     .collection("lessonPlans").stream()
             return [d.to_dict() for d in docs]
+
+        try:
+            if limit or start_after or fields:
+                collection = db.collection("teachers").document(teacher_id)\
+                    .collection("lessonPlans")
+                return list_page(collection, limit, start_after, fields)
+            return list_cache.get_or_load(teacher_id, "lessonPlans", load)
         except Exception as e:
             logger.error(f"Error listing lesson plans: {e}")
             return []
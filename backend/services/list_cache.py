@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+from config.settings import settings
+from core.firebase_client import db
+from utils.app_logger import logger
+
+class ListCache:
+    """
+    In-process TTL + LRU cache for teacher subcollection listings, keyed by
+    (teacher_id, collection). Service writes invalidate the matching key.
+
+    With listen mode enabled, a Firestore on_snapshot listener is attached the
+    first time a key is loaded and keeps that entry current without expiry.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, listen: bool = False):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.listen = listen
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._watches = {}
+        self._lock = threading.Lock()
+
+    def get(self, teacher_id: str, collection: str):
+        key = (teacher_id, collection)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, items = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return list(items)
+
+    def set(self, teacher_id: str, collection: str, items: list, generation: int = None):
+        """
+        Store a listing. If ``generation`` is given and the key was
+        invalidated since it was read, the (now stale) listing is dropped.
+        """
+        key = (teacher_id, collection)
+        with self._lock:
+            if generation is not None and generation != self._generations.get(key, 0):
+                return
+            expires_at = None if key in self._watches else time.monotonic() + self.ttl_seconds
+            self._entries[key] = (expires_at, list(items))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._unwatch(evicted)
+
+    def invalidate(self, teacher_id: str, collection: str):
+        key = (teacher_id, collection)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+
+    def invalidate_path(self, doc_path: str):
+        """Invalidate the listing containing a document path like teachers/<id>/<collection>/<doc>"""
+        parts = doc_path.split("/")
+        if len(parts) == 4 and parts[0] == "teachers":
+            self.invalidate(parts[1], parts[2])
+
+    def get_or_load(self, teacher_id: str, collection: str, loader):
+        """Return the cached listing, calling ``loader()`` to fill it on a miss"""
+        items = self.get(teacher_id, collection)
+        if items is not None:
+            return items
+
+        with self._lock:
+            generation = self._generations.get((teacher_id, collection), 0)
+        items = loader()
+        self.set(teacher_id, collection, items, generation)
+
+        if self.listen:
+            self.watch(teacher_id, collection)
+        return list(items)
+
+    async def get_or_load_async(self, teacher_id: str, collection: str, loader):
+        """Async counterpart of get_or_load for an awaitable ``loader()``"""
+        items = self.get(teacher_id, collection)
+        if items is not None:
+            return items
+
+        with self._lock:
+            generation = self._generations.get((teacher_id, collection), 0)
+        items = await loader()
+        self.set(teacher_id, collection, items, generation)
+
+        if self.listen:
+            self.watch(teacher_id, collection)
+        return list(items)
+
+    def watch(self, teacher_id: str, collection: str):
+        """Keep a key hot with a Firestore snapshot listener"""
+        key = (teacher_id, collection)
+        with self._lock:
+            if key in self._watches:
+                return
+
+        def on_snapshot(docs, changes, read_time):
+            self.set(teacher_id, collection, [d.to_dict() for d in docs])
+
+        try:
+            watch = db.collection("teachers").document(teacher_id)\
+                .collection(collection).on_snapshot(on_snapshot)
+        except Exception as e:
+            logger.error(f"Error starting snapshot listener for {collection}: {e}")
+            return
+
+        with self._lock:
+            if key in self._watches:
+                watch.unsubscribe()
+            else:
+                self._watches[key] = watch
+
+    def _unwatch(self, key):
+        watch = self._watches.pop(key, None)
+        if watch is not None:
+            watch.unsubscribe()
+
+
+list_cache = ListCache(
+    settings.LIST_CACHE_TTL_SECONDS,
+    settings.LIST_CACHE_MAX_ENTRIES,
+    listen=settings.LIST_CACHE_LISTEN
+)
@@ -0,0 +1,268 @@
+import asyncio
+import contextlib
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from google import genai
+from google.genai import errors, types
+from config.settings import settings
+from utils.app_logger import logger
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Each acquire reserves one token and returns how
+    long the caller has to wait for it, so waiters are served in order even
+    when the bucket is empty.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class LLMGateway:
+    """
+    Single entry point for Gemini calls. Every request is:
+
+    - routed to a model per task (LLM_MODEL_ROUTES, e.g. "plan=gemini-2.5-flash-lite")
+    - rate limited by a per-model token bucket (LLM_REQUESTS_PER_MINUTE / LLM_BURST)
+    - bounded to LLM_MAX_CONCURRENCY in-flight calls, shared by sync and async callers
+    - given a timeout (LLM_TIMEOUT_SECONDS unless overridden per call)
+    - retried with exponential backoff and full jitter on 429, 5xx and
+      network timeouts, up to LLM_MAX_RETRIES times
+
+    Requests take the same keyword arguments as client.models.generate_content.
+    """
+
+    RETRYABLE_NETWORK_ERRORS = (httpx.TimeoutException, httpx.TransportError, asyncio.TimeoutError)
+
+    def __init__(self, api_key: str):
+        self.client = genai.Client(api_key=api_key)
+        self.routes = self._parse_routes(settings.LLM_MODEL_ROUTES)
+        self._buckets = {}
+        self._buckets_lock = threading.Lock()
+        # One budget for both paths: sync callers block on it directly,
+        # async callers queue on an asyncio semaphore first (see _async_slot)
+        self._slots = threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENCY)
+        self._async_slots = None
+        # Only used when an async caller has to wait for a slot held by a
+        # sync caller; never the loop's default executor, which every
+        # asyncio.to_thread in the app shares
+        self._slot_waiter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-slot")
+
+    @staticmethod
+    def _parse_routes(spec: str) -> dict:
+        routes = {}
+        for item in (spec or "").split(","):
+            task, _, model = item.partition("=")
+            if task.strip() and model.strip():
+                routes[task.strip()] = model.strip()
+        return routes
+
+    def model_for(self, task: str) -> str:
+        return self.routes.get(task, settings.LLM_DEFAULT_MODEL)
+
+    def _bucket(self, model: str) -> TokenBucket:
+        with self._buckets_lock:
+            if model not in self._buckets:
+                self._buckets[model] = TokenBucket(settings.LLM_REQUESTS_PER_MINUTE, settings.LLM_BURST)
+            return self._buckets[model]
+
+    def _async_semaphore(self) -> asyncio.Semaphore:
+        if self._async_slots is None:
+            self._async_slots = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        return self._async_slots
+
+    def _release_when_acquired(self, waiter):
+        if not waiter.cancelled() and waiter.exception() is None:
+            self._slots.release()
+
+    @contextlib.asynccontextmanager
+    async def _async_slot(self):
+        """
+        Hold one of the shared slots without blocking the event loop. Async
+        callers wait on an asyncio semaphore, so at most LLM_MAX_CONCURRENCY
+        of them contend for the shared slots; only those few wait on the
+        dedicated thread when sync callers hold every slot.
+        """
+        async with self._async_semaphore():
+            if not self._slots.acquire(blocking=False):
+                waiter = asyncio.get_running_loop().run_in_executor(self._slot_waiter, self._slots.acquire)
+                try:
+                    await asyncio.shield(waiter)
+                except asyncio.CancelledError:
+                    # The thread still gets the slot eventually; hand it back
+                    waiter.add_done_callback(self._release_when_acquired)
+                    raise
+            try:
+                yield
+            finally:
+                self._slots.release()
+
+    @staticmethod
+    def _with_timeout(request: dict, timeout: float = None) -> dict:
+        timeout_ms = int((timeout or settings.LLM_TIMEOUT_SECONDS) * 1000)
+        config = request.get("config") or types.GenerateContentConfig()
+        config = config.model_copy(update={"http_options": types.HttpOptions(timeout=timeout_ms)})
+        return {**request, "config": config}
+
+    @classmethod
+    def _is_retryable(cls, error: Exception) -> bool:
+        if isinstance(error, errors.APIError):
+            return error.code == 429 or (error.code or 0) >= 500
+        return isinstance(error, cls.RETRYABLE_NETWORK_ERRORS)
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        delay = min(settings.LLM_MAX_BACKOFF_SECONDS, settings.LLM_BACKOFF_SECONDS * 2 ** attempt)
+        return random.uniform(0, delay)
+
+    def _should_retry(self, error: Exception, attempt: int, label: str):
+        """Return the backoff delay for a retryable error, or None to re-raise it"""
+        if attempt >= settings.LLM_MAX_RETRIES or not self._is_retryable(error):
+            return None
+        delay = self._backoff(attempt)
+        logger.warning(f"{label} failed ({error}), retrying in {delay:.1f}s")
+        return delay
+
+    # ---------------------------------------------------
+    # Generic calls (used for generate and cache management)
+    # ---------------------------------------------------
+    def call(self, model: str, fn, *args, **kwargs):
+        attempt = 0
+        while True:
+            self._bucket(model).acquire()
+            try:
+                with self._slots:
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._should_retry(e, attempt, f"Gemini call to {model}")
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+    async def call_async(self, model: str, fn, *args, **kwargs):
+        attempt = 0
+        while True:
+            await self._bucket(model).acquire_async()
+            try:
+                async with self._async_slot():
+                    return await fn(*args, **kwargs)
+            except Exception as e:
+                delay = self._should_retry(e, attempt, f"Gemini call to {model}")
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    # ---------------------------------------------------
+    # generate_content
+    # ---------------------------------------------------
+    def generate(self, timeout: float = None, **request):
+        request = self._with_timeout(request, timeout)
+        return self.call(request["model"], self.client.models.generate_content, **request)
+
+    async def generate_async(self, timeout: float = None, **request):
+        request = self._with_timeout(request, timeout)
+        return await self.call_async(request["model"], self.client.aio.models.generate_content, **request)
+
+    def stream(self, timeout: float = None, **request):
+        """
+        Yield response chunks from generate_content_stream. Failures before
+        the first chunk are retried like generate; once text has been
+        yielded an error is raised to the caller.
+
+        A slot is held only while the request is opened and a chunk is
+        read, never while the caller handles a chunk, so a slow consumer
+        doesn't keep other calls waiting.
+        """
+        request = self._with_timeout(request, timeout)
+        model = request["model"]
+        attempt = 0
+        while True:
+            self._bucket(model).acquire()
+            started = False
+            try:
+                with self._slots:
+                    chunks = iter(self.client.models.generate_content_stream(**request))
+                while True:
+                    with self._slots:
+                        chunk = next(chunks, None)
+                    if chunk is None:
+                        return
+                    started = True
+                    yield chunk
+            except Exception as e:
+                delay = None if started else self._should_retry(e, attempt, f"Gemini stream from {model}")
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+
+    async def stream_async(self, timeout: float = None, **request):
+        """Async version of stream, with the same slot handling"""
+        request = self._with_timeout(request, timeout)
+        model = request["model"]
+        attempt = 0
+        while True:
+            await self._bucket(model).acquire_async()
+            started = False
+            try:
+                async with self._async_slot():
+                    chunks = aiter(await self.client.aio.models.generate_content_stream(**request))
+                while True:
+                    async with self._async_slot():
+                        chunk = await anext(chunks, None)
+                    if chunk is None:
+                        return
+                    started = True
+                    yield chunk
+            except Exception as e:
+                delay = None if started else self._should_retry(e, attempt, f"Gemini stream from {model}")
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    # ---------------------------------------------------
+    # Context caches
+    # ---------------------------------------------------
+    def create_cache(self, model: str, config):
+        return self.call(model, self.client.caches.create, model=model, config=config)
+
+    async def create_cache_async(self, model: str, config):
+        return await self.call_async(model, self.client.aio.caches.create, model=model, config=config)
+
+    def delete_cache(self, model: str, name: str):
+        return self.call(model, self.client.caches.delete, name=name)
+
+    async def delete_cache_async(self, model: str, name: str):
+        return await self.call_async(model, self.client.aio.caches.delete, name=name)
+
+
+gateway = LLMGateway(settings.GEMINI_API_KEY)
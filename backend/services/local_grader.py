@@ -0,0 +1,127 @@
+import math
+import re
+from fractions import Fraction
+from config.settings import settings
+
+# Deterministic grading for objective answers (option letters, numbers and
+# single words). AI_engine.compare_answers runs this first and only sends
+# the questions it can't decide to Gemini.
+
+# "1. B", "1) 42", "Q1: yes", "Question 3 - (c)", "4 = 3/4". A "." directly
+# followed by a digit is a decimal point, so a line like "3.5" is an answer
+# (continuing the previous question), not question 3.
+ANSWER_LINE = re.compile(
+    r"^\s*(?:q(?:uestion)?\.?\s*)?(\d+)\s*(?:[):=\-–]|\.(?!\d))\s*(.*?)\s*$",
+    re.IGNORECASE
+)
+OPTION = re.compile(r"^\(?([a-h])[).]?$", re.IGNORECASE)
+NUMBER = re.compile(r"^[-+]?(?:\d{1,3}(?:,\d{3})+|\d+)?(?:\.\d+)?$")
+FRACTION = re.compile(r"^[-+]?\d+\s*/\s*\d+$")
+WORD = re.compile(r"^[^\W\d_]+(?:['-][^\W\d_]+)*$")
+
+
+def question_number(value):
+    """Question number as an int ("3", 3 and 3.0 all give 3), or None"""
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return None
+        return int(number) if number.is_integer() else None
+
+
+def parse_numbered_answers(text: str) -> dict:
+    """
+    Map question number -> answer text for an answer sheet written one
+    answer per line. Lines that don't start with a question number are
+    treated as a continuation of the previous answer.
+    """
+    answers = {}
+    current = None
+    for line in text.splitlines():
+        match = ANSWER_LINE.match(line)
+        if match:
+            current = int(match.group(1))
+            answers[current] = match.group(2)
+        elif current is not None and line.strip():
+            answers[current] = f"{answers[current]} {line.strip()}".strip()
+    return answers
+
+
+def normalize_answer(answer: str):
+    """
+    Classify an answer as ("option", letter), ("number", value) or
+    ("word", text). Returns None for anything else (sentences, working,
+    expressions), which is left for the LLM.
+    """
+    text = " ".join(str(answer).split()).rstrip(".").strip()
+    if not text:
+        return None
+
+    option = OPTION.match(text)
+    if option:
+        return "option", option.group(1).lower()
+
+    try:
+        if FRACTION.match(text):
+            return "number", float(Fraction(text.replace(" ", "")))
+        if NUMBER.match(text) and any(c.isdigit() for c in text):
+            return "number", float(text.replace(",", ""))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+    if WORD.match(text):
+        return "word", text.casefold()
+
+    return None
+
+
+def answers_match(expected, given) -> bool:
+    kind, value = expected
+    if kind == "number":
+        return math.isclose(value, given[1], rel_tol=settings.GRADER_NUMERIC_TOLERANCE, abs_tol=1e-9)
+    return value == given[1]
+
+
+def grade_locally(questions: list, teacher_text: str, student_text: str):
+    """
+    Grade the questions whose teacher answer is objective.
+
+    Returns:
+        tuple: (results, undecided) where results are comparison dicts in the
+               same shape Gemini returns and undecided is the list of question
+               numbers that still need the LLM
+    """
+    teacher_answers = parse_numbered_answers(teacher_text)
+    student_answers = parse_numbered_answers(student_text)
+
+    results = []
+    undecided = []
+    for question in questions:
+        number = question_number(question.get("number"))
+        if number is None:
+            undecided.append(question.get("number"))
+            continue
+
+        expected = normalize_answer(teacher_answers.get(number, ""))
+        student_answer = student_answers.get(number, "").strip()
+        given = normalize_answer(student_answer)
+        if expected is None or given is None or given[0] != expected[0]:
+            # No answer line found (the sheet may be laid out differently),
+            # or e.g. "B because ..." against "B": let the LLM judge it
+            undecided.append(number)
+            continue
+        correct = answers_match(expected, given)
+
+        results.append({
+            "question_number": number,
+            "topic": question.get("topic"),
+            "teacher_answer": teacher_answers[number],
+            "student_answer": student_answer,
+            "correct": correct,
+            "graded_by": "local"
+        })
+
+    return results, undecided
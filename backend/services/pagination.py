@@ -0,0 +1,35 @@
+from google.cloud.firestore_v1.field_path import FieldPath
+
+def list_page(collection_ref, limit: int = None, start_after: str = None, fields: list = None):
+    """
+    Read one page of a subcollection ordered by document ID.
+
+    Args:
+        collection_ref: Firestore CollectionReference to read
+        limit: Maximum number of documents to return
+        start_after: Document ID of the last item of the previous page
+        fields: Optional list of field names to project (server-side select)
+
+    Returns:
+        list: Document dicts, each with its document ``id`` so the last one
+              can be passed back as the next ``start_after`` cursor
+    """
+    query = _page_query(collection_ref, limit, start_after, fields)
+    return [{"id": d.id, **(d.to_dict() or {})} for d in query.stream()]
+
+
+async def list_page_async(collection_ref, limit: int = None, start_after: str = None, fields: list = None):
+    """Same as list_page for an AsyncCollectionReference"""
+    query = _page_query(collection_ref, limit, start_after, fields)
+    return [{"id": d.id, **(d.to_dict() or {})} async for d in query.stream()]
+
+
+def _page_query(collection_ref, limit, start_after, fields):
+    query = collection_ref.order_by(FieldPath.document_id())
+    if fields:
+        query = query.select(fields)
+    if start_after:
+        query = query.start_after({FieldPath.document_id(): start_after})
+    if limit:
+        query = query.limit(limit)
+    return query
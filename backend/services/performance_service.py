@@ -1,14 +1,28 @@
+from datetime import datetime
+from firebase_admin import firestore
 from core.firebase_client import db
 from utils.app_logger import logger
 
 class PerformanceService:
 
+    # Kept current by the services that write the underlying documents
+    # (update_overview / recompute_overview), never by save_overview
+    MAINTAINED_FIELDS = ("weak_areas_count", "recommendations_count", "test_papers_uploaded", "syllabus_uploaded")
+
+    @staticmethod
+    def editable_fields(overview_obj) -> dict:
+        """The part of an overview a client may write"""
+        return {
+            name: value for name, value in overview_obj.to_dict().items()
+            if name not in PerformanceService.MAINTAINED_FIELDS
+        }
+
     @staticmethod
     def save_overview(teacher_id: str, overview_obj):
         try:
             db.collection("teachers").document(teacher_id)\
                 .collection("performance").document("overview")\
-                .set(overview_obj.to_dict(), merge=True)
+                .set(PerformanceService.editable_fields(overview_obj), merge=True)
             return True
         except Exception as e:
             logger.error(f"Error saving performance overview: {e}")
@@ -25,3 +39,85 @@ class PerformanceService:
             logger.error(f"Error fetching performance overview: {e}")
             return None
 
+    @staticmethod
+    def overview_changes(counters: dict = None, flags: dict = None) -> dict:
+        """Merge-write fields that bump counters atomically and set status flags"""
+        changes = {name: firestore.Increment(amount) for name, amount in (counters or {}).items()}
+        changes.update(flags or {})
+        changes["last_updated"] = datetime.now().isoformat()
+        return changes
+
+    @staticmethod
+    def update_overview(teacher_id: str, counters: dict = None, flags: dict = None, batch=None):
+        """
+        Incrementally maintain the overview document, e.g.
+        counters={"weak_areas_count": 1} or flags={"syllabus_uploaded": True}.
+        Pass the batch of the write that triggered the change so both commit together.
+        """
+        try:
+            doc_ref = db.collection("teachers").document(teacher_id)\
+                .collection("performance").document("overview")
+            changes = PerformanceService.overview_changes(counters, flags)
+            if batch is not None:
+                batch.set(doc_ref, changes, merge=True)
+            else:
+                doc_ref.set(changes, merge=True)
+        except Exception as e:
+            logger.error(f"Error updating performance overview: {e}")
+
+    @staticmethod
+    def upsert_counted(teacher_id: str, doc_ref, data: dict, counter: str):
+        """
+        set(merge=True) a document and bump the overview counter when the
+        write creates it, in one transaction so concurrent upserts of the
+        same new document count it once.
+        """
+        @firestore.transactional
+        def write(transaction):
+            created = not doc_ref.get(transaction=transaction).exists
+            transaction.set(doc_ref, data, merge=True)
+            if created:
+                PerformanceService.update_overview(teacher_id, counters={counter: 1}, batch=transaction)
+
+        write(db.transaction())
+
+    @staticmethod
+    def recompute_overview(teacher_id: str):
+        """
+        Rebuild the maintained counters and flags from the collections
+        themselves. Used to backfill teachers created before the overview
+        was kept incrementally, or to repair drift.
+        """
+        try:
+            teacher_ref = db.collection("teachers").document(teacher_id)
+
+            def count(collection):
+                return sum(1 for _ in teacher_ref.collection(collection).select([]).stream())
+
+            def any_doc(collection):
+                return any(True for _ in teacher_ref.collection(collection).select([]).limit(1).stream())
+
+            teacher_ref.collection("performance").document("overview").set({
+                "weak_areas_count": count("weakAreas"),
+                "recommendations_count": count("recommendations"),
+                "test_papers_uploaded": any_doc("testPapers"),
+                "syllabus_uploaded": any_doc("syllabi"),
+                "last_updated": datetime.now().isoformat()
+            }, merge=True)
+            return True
+        except Exception as e:
+            logger.error(f"Error recomputing performance overview: {e}")
+            return False
+
+    @staticmethod
+    def recompute_all_overviews():
+        """Run recompute_overview for every teacher and return how many succeeded"""
+        teacher_ids = [doc.id for doc in db.collection("teachers").select([]).stream()]
+        done = sum(PerformanceService.recompute_overview(teacher_id) for teacher_id in teacher_ids)
+        logger.info(f"Recomputed performance overview for {done} of {len(teacher_ids)} teachers")
+        return done
+
+
+if __name__ == "__main__":
+    # One-off backfill: python -m services.performance_service
+    PerformanceService.recompute_all_overviews()
@@ -1,35 +1,78 @@
 from core.firebase_client import db
+from services.list_cache import list_cache
+from services.pagination import list_page
+from services.performance_service import PerformanceService
+from services.unit_of_work import UnitOfWork
 from utils.app_logger import logger
 
 class RecommendationService:
 
     @staticmethod
-    def save_recommendation(teacher_id: str, rec_id: str, rec_obj):
+    def save_recommendation(teacher_id: str, rec_id: str, rec_obj, batch=None):
         try:
-            db.collection("teachers").document(teacher_id)\
-                .collection("recommendations").document(rec_id)\
-                .set(rec_obj.to_dict(), merge=True)
+            doc_ref = db.collection("teachers").document(teacher_id)\
+                .collection("recommendations").document(rec_id)
+            if batch is not None:
+                # The caller owns the batch, so it also owns recommendations_count
+                batch.set(doc_ref, rec_obj.to_dict(), merge=True)
+            else:
+                PerformanceService.upsert_counted(teacher_id, doc_ref, rec_obj.to_dict(), "recommendations_count")
+                list_cache.invalidate(teacher_id, "recommendations")
         except Exception as e:
             logger.error(f"Error saving recommendation: {e}")
 
     @staticmethod
-    def add_recommendation(teacher_id: str, rec_obj):
+    def add_recommendation(teacher_id: str, rec_obj, batch=None):
         """Add a recommendation with auto-generated ID and return the ID"""
         try:
             doc_ref = db.collection("teachers").document(teacher_id)\
                 .collection("recommendations").document()
-            doc_ref.set(rec_obj.to_dict())
+            unit = batch if batch is not None else UnitOfWork()
+            unit.set(doc_ref, rec_obj.to_dict())
+            PerformanceService.update_overview(teacher_id, counters={"recommendations_count": 1}, batch=unit)
+            if batch is None and not unit.commit():
+                return None
             return doc_ref.id
         except Exception as e:
             logger.error(f"Error adding recommendation: {e}")
             return None
 
     @staticmethod
-    def list_recommendations(teacher_id: str):
-        try:
+    def add_recommendations(teacher_id: str, rec_objs: list):
+        """
+        Add many recommendations in atomic batches (documents plus counter) and
+        return the IDs written. If a batch fails, only the IDs of the
+        batches committed before it are returned.
+        """
+        ids = []
+        for chunk in UnitOfWork.chunks(rec_objs, reserved=1):
+            batch = UnitOfWork()
+            chunk_ids = []
+            for rec_obj in chunk:
+                doc_ref = db.collection("teachers").document(teacher_id)\
+                    .collection("recommendations").document()
+                batch.set(doc_ref, rec_obj.to_dict())
+                chunk_ids.append(doc_ref.id)
+            PerformanceService.update_overview(teacher_id, counters={"recommendations_count": len(chunk_ids)}, batch=batch)
+            if not batch.commit():
+                logger.error(f"Added {len(ids)} of {len(rec_objs)} recommendations before a batch failed")
+                return ids
+            ids.extend(chunk_ids)
+        return ids
+
+    @staticmethod
+    def list_recommendations(teacher_id: str, limit: int = None, start_after: str = None, fields: list = None):
+        def load():
             docs = db.collection("teachers").document(teacher_id)\
                     .collection("recommendations").stream()
             return [d.to_dict() for d in docs]
+
+        try:
+            if limit or start_after or fields:
+                collection = db.collection("teachers").document(teacher_id)\
+                    .collection("recommendations")
+                return list_page(collection, limit, start_after, fields)
+            return list_cache.get_or_load(teacher_id, "recommendations", load)
         except Exception as e:
             logger.error(f"Error listing recommendations: {e}")
             return []
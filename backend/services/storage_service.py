@@ -2,9 +2,16 @@ import cloudinary
 import cloudinary.uploader
 import cloudinary.api
 from config.settings import settings
+from core.firebase_client import db
 from utils.app_logger import logger
+import hashlib
 import os
-from typing import List, Dict, Optional
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Optional, BinaryIO, Callable
 from datetime import datetime
 
 # Configure Cloudinary
@@ -14,10 +21,132 @@ cloudinary.config(
     api_secret=settings.CLOUDINARY_API_SECRET
 )
 
+# Chunk size used when streaming uploads (Cloudinary's minimum is 5 MB)
+UPLOAD_CHUNK_SIZE = 6 * 1024 * 1024
+
+# Cloudinary's uploader raises a plain cloudinary.exceptions.Error with the
+# server's message for every failed call (5xx and 420/429 included) and
+# drops the HTTP status, so bulk uploads retry any Error except those whose
+# message marks a permanent (4xx) problem with the request itself.
+PERMANENT_ERROR_MARKERS = (
+    "invalid", "missing required", "must supply", "not allowed", "not found",
+    "unknown api key", "file size too large", "unsupported", "empty file", "disabled"
+)
+
+# Per-teacher Firestore subcollection indexing uploaded content by SHA-256
+FILE_HASH_COLLECTION = "fileHashes"
+
 class StorageService:
 
+    # In-process copy of the hash index, keyed by (teacher_id, hash), so
+    # repeat lookups skip Firestore
+    _hash_index = {}
+    _hash_index_lock = threading.Lock()
+
+    @staticmethod
+    def hash_fileobj(file_obj: BinaryIO) -> str:
+        """Return the SHA-256 hex digest of a file-like object and rewind it"""
+        digest = hashlib.sha256()
+        file_obj.seek(0)
+        for chunk in iter(lambda: file_obj.read(1024 * 1024), b""):
+            digest.update(chunk)
+        file_obj.seek(0)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _hash_collection(teacher_id: str):
+        return db.collection("teachers").document(teacher_id)\
+            .collection(FILE_HASH_COLLECTION)
+
+    @staticmethod
+    def find_by_hash(teacher_id: str, file_hash: str, folder: str = None, resource_type: str = "raw") -> Optional[str]:
+        """
+        Look up a file this teacher previously uploaded by content hash
+        
+        Returns:
+            str: Download URL of the existing copy, or None if this teacher has
+                 not uploaded this content to the same folder/resource type
+        """
+        entry = StorageService._hash_index.get((teacher_id, file_hash))
+        if entry is None:
+            try:
+                doc = StorageService._hash_collection(teacher_id).document(file_hash).get()
+                entry = doc.to_dict() if doc.exists else None
+            except Exception as e:
+                logger.error(f"Error looking up file hash: {e}")
+                return None
+            if entry is None:
+                return None
+            with StorageService._hash_index_lock:
+                StorageService._hash_index[(teacher_id, file_hash)] = entry
+
+        if entry.get("folder") != folder or entry.get("resource_type") != resource_type:
+            return None
+        return entry.get("url")
+
+    @staticmethod
+    def record_hash(teacher_id: str, file_hash: str, result: dict, filename: str, folder: str = None, resource_type: str = "raw"):
+        """Remember where this teacher's content with this hash was uploaded"""
+        entry = {
+            "url": StorageService._result_url(result),
+            "public_id": result.get("public_id"),
+            "file_name": filename,
+            "folder": folder,
+            "resource_type": resource_type,
+            "uploaded_at": datetime.now().isoformat()
+        }
+        with StorageService._hash_index_lock:
+            StorageService._hash_index[(teacher_id, file_hash)] = entry
+        try:
+            StorageService._hash_collection(teacher_id).document(file_hash).set(entry)
+        except Exception as e:
+            logger.error(f"Error recording file hash: {e}")
+
+    @staticmethod
+    def forget_hashes(full_public_id: str, teacher_id: str = None):
+        """
+        Drop hash records pointing at a deleted asset, so identical content
+        uploaded later is sent to Cloudinary again instead of reusing a dead URL.
+        Without a teacher_id every teacher's records are searched.
+        """
+        with StorageService._hash_index_lock:
+            for key, entry in list(StorageService._hash_index.items()):
+                if entry.get("public_id") == full_public_id:
+                    del StorageService._hash_index[key]
+        try:
+            if teacher_id:
+                query = StorageService._hash_collection(teacher_id)
+            else:
+                query = db.collection_group(FILE_HASH_COLLECTION)
+            for doc in query.where("public_id", "==", full_public_id).stream():
+                doc.reference.delete()
+        except Exception as e:
+            logger.error(f"Error clearing file hash records: {e}")
+
+    @staticmethod
+    def _result_url(result: dict) -> str:
+        return result.get('secure_url') or result.get('url')
+
+    @staticmethod
+    def _upload(file_path: str, folder: str = None, public_id: str = None, resource_type: str = "raw") -> dict:
+        """Upload a local file to Cloudinary and return the upload result, raising on failure"""
+        # Prepare upload options
+        upload_options = {
+            'resource_type': resource_type
+        }
+        
+        if folder:
+            upload_options['folder'] = folder
+        
+        if public_id:
+            upload_options['public_id'] = public_id
+        
+        # Upload to Cloudinary
+        return cloudinary.uploader.upload(file_path, **upload_options)
+
     @staticmethod
-    def upload_file(file_path: str, folder: str = None, public_id: str = None, resource_type: str = "raw") -> str:
+    def upload_file(file_path: str, folder: str = None, public_id: str = None, resource_type: str = "raw",
+                    teacher_id: str = None) -> str:
         """
         Upload a file (PDF, Word doc, etc.) to Cloudinary and return the download URL
         
@@ -26,6 +155,7 @@ class StorageService:
             folder: Optional folder path in Cloudinary (e.g., 'teachers/teacher_id')
             public_id: Optional public ID for the file (filename without extension)
             resource_type: Type of resource - 'raw' for PDFs/docs, 'image' for images
+            teacher_id: Reuse the URL of this teacher's earlier upload with identical content
         
         Returns:
             str: Download URL of the uploaded file, or None if upload failed
@@ -35,22 +165,20 @@ class StorageService:
                 logger.error(f"File not found: {file_path}")
                 return None
             
-            # Prepare upload options
-            upload_options = {
-                'resource_type': resource_type
-            }
+            file_hash = None
+            if teacher_id:
+                with open(file_path, "rb") as f:
+                    file_hash = StorageService.hash_fileobj(f)
+                url = StorageService.find_by_hash(teacher_id, file_hash, folder, resource_type)
+                if url:
+                    logger.info(f"Reusing existing upload for identical file: {os.path.basename(file_path)}")
+                    return url
             
-            if folder:
-                upload_options['folder'] = folder
-            
-            if public_id:
-                upload_options['public_id'] = public_id
+            result = StorageService._upload(file_path, folder, public_id, resource_type)
+            url = StorageService._result_url(result)
             
-            # Upload to Cloudinary
-            result = cloudinary.uploader.upload(file_path, **upload_options)
-            
-            # Get the secure URL
-            url = result.get('secure_url') or result.get('url')
+            if file_hash and url:
+                StorageService.record_hash(teacher_id, file_hash, result, os.path.basename(file_path), folder, resource_type)
             
             logger.info(f"File uploaded successfully to Cloudinary: {os.path.basename(file_path)}")
             logger.info(f"Download URL: {url}")
@@ -109,52 +237,200 @@ class StorageService:
             return None
 
     @staticmethod
-    def upload_files_bulk(file_paths: List[str], folder: str = None, resource_type: str = "raw") -> Dict[str, Optional[str]]:
+    def upload_stream(file_obj: BinaryIO, filename: str, folder: str = None, public_id: str = None, resource_type: str = "raw",
+                      teacher_id: str = None, file_hash: str = None) -> str:
         """
-        Upload multiple files to Cloudinary in bulk
+        Stream a file-like object to Cloudinary in chunks and return the download URL
+        
+        The object is read UPLOAD_CHUNK_SIZE bytes at a time, so request bodies
+        can be forwarded without first being written to a local file.
+        
+        Args:
+            file_obj: Readable binary file-like object (e.g. an UploadFile's spooled file)
+            filename: Original filename (used to determine file type)
+            folder: Optional folder path in Cloudinary
+            public_id: Optional public ID for the file
+            resource_type: Type of resource - 'raw' for PDFs/docs, 'image' for images
+            teacher_id: Reuse the URL of this teacher's earlier upload with identical content
+            file_hash: SHA-256 of the content, if the caller already computed it
+        
+        Returns:
+            str: Download URL of the uploaded file, or None if upload failed
+        """
+        try:
+            if teacher_id:
+                file_hash = file_hash or StorageService.hash_fileobj(file_obj)
+                url = StorageService.find_by_hash(teacher_id, file_hash, folder, resource_type)
+                if url:
+                    logger.info(f"Reusing existing upload for identical file: {filename}")
+                    return url
+            
+            upload_options = {
+                'resource_type': resource_type,
+                'filename': filename,
+                'chunk_size': UPLOAD_CHUNK_SIZE
+            }
+            
+            if folder:
+                upload_options['folder'] = folder
+            
+            if public_id:
+                upload_options['public_id'] = public_id
+            
+            result = cloudinary.uploader.upload_large(file_obj, **upload_options)
+            
+            # Get the secure URL
+            url = StorageService._result_url(result)
+            
+            if teacher_id and url:
+                StorageService.record_hash(teacher_id, file_hash, result, filename, folder, resource_type)
+            
+            logger.info(f"File streamed successfully to Cloudinary: {filename}")
+            logger.info(f"Download URL: {url}")
+            
+            return url
+            
+        except Exception as e:
+            logger.error(f"Error streaming file to Cloudinary: {e}")
+            logger.exception("Full error details:")
+            return None
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        errors = cloudinary.exceptions
+        if isinstance(error, errors.RateLimited):
+            return True
+        if isinstance(error, (errors.BadRequest, errors.AuthorizationRequired, errors.NotFound,
+                              errors.NotAllowed, errors.AlreadyExists)):
+            return False
+        if isinstance(error, errors.Error):
+            message = str(error).lower()
+            return "rate limit" in message or not any(marker in message for marker in PERMANENT_ERROR_MARKERS)
+        return isinstance(error, (ConnectionError, TimeoutError))
+
+    @staticmethod
+    def _upload_with_retry(file_path: str, folder: str, resource_type: str, max_retries: int, backoff_seconds: float):
+        """Upload one bulk file, retrying transient errors with exponential backoff"""
+        # Generate public_id from filename; the random suffix keeps parallel
+        # uploads of same-named files (e.g. answers.pdf from two folders) apart
+        filename_without_ext = os.path.splitext(os.path.basename(file_path))[0]
+        public_id = f"{filename_without_ext}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+        attempt = 0
+        while True:
+            try:
+                return StorageService._upload(file_path, folder, public_id, resource_type), attempt
+            except Exception as e:
+                if attempt >= max_retries or not StorageService._is_transient(e):
+                    logger.error(f"Error uploading file to Cloudinary: {e}")
+                    return None, attempt
+                delay = backoff_seconds * (2 ** attempt) + random.uniform(0, backoff_seconds)
+                attempt += 1
+                logger.warning(f"Retrying {os.path.basename(file_path)} in {delay:.1f}s "
+                               f"(attempt {attempt}/{max_retries}): {e}")
+                time.sleep(delay)
+
+    @staticmethod
+    def upload_files_bulk(file_paths: List[str], folder: str = None, resource_type: str = "raw",
+                          max_workers: int = None, max_retries: int = 3, backoff_seconds: float = 1.0,
+                          progress_callback: Callable[[int, int, str, Optional[str]], None] = None,
+                          return_stats: bool = False, teacher_id: str = None):
+        """
+        Upload multiple files to Cloudinary in bulk using a pool of worker threads
         
         Args:
             file_paths: List of local file paths to upload
             folder: Optional folder path in Cloudinary
             resource_type: Type of resource - 'raw' for PDFs/docs, 'image' for images
+            max_workers: Number of concurrent uploads (defaults to UPLOAD_WORKERS)
+            max_retries: Retries per file for transient Cloudinary/network errors
+            backoff_seconds: Base delay for exponential backoff between retries
+            progress_callback: Optional callable(completed, total, file_path, url),
+                               called as each file finishes (url is None on failure)
+            return_stats: Also return timing statistics for the run
+            teacher_id: Skip files whose content this teacher already uploaded and reuse their URL
         
         Returns:
             Dict[str, Optional[str]]: Dictionary mapping file paths to their download URLs
-                                      (None if upload failed for that file)
+                                      (None if upload failed for that file).
+                                      With return_stats, a (results, stats) tuple.
         """
         results = {}
+        durations = {}
         total_files = len(file_paths)
-        successful = 0
-        failed = 0
-        
-        logger.info(f"Starting bulk upload of {total_files} files...")
+        max_workers = max_workers or settings.UPLOAD_WORKERS
+        counters = {"completed": 0, "successful": 0, "failed": 0, "retries": 0, "deduplicated": 0}
+        lock = threading.Lock()
+        started = time.perf_counter()
         
-        for idx, file_path in enumerate(file_paths, 1):
-            logger.info(f"\n[{idx}/{total_files}] Uploading: {os.path.basename(file_path)}")
-            
-            # Generate public_id from filename
-            filename_without_ext = os.path.splitext(os.path.basename(file_path))[0]
-            public_id = f"{filename_without_ext}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            
-            url = StorageService.upload_file(
-                file_path=file_path,
-                folder=folder,
-                public_id=public_id,
-                resource_type=resource_type
-            )
-            
-            if url:
-                results[file_path] = url
-                successful += 1
-                logger.info(f"✓ Success: {os.path.basename(file_path)}")
+        logger.info(f"Starting bulk upload of {total_files} files with {max_workers} workers...")
+
+        def upload_one(file_path):
+            file_started = time.perf_counter()
+            url, retries, file_hash = None, 0, None
+            if not os.path.exists(file_path):
+                logger.error(f"File not found: {file_path}")
             else:
-                results[file_path] = None
-                failed += 1
-                logger.error(f"✗ Failed: {os.path.basename(file_path)}")
+                if teacher_id:
+                    with open(file_path, "rb") as f:
+                        file_hash = StorageService.hash_fileobj(f)
+                    url = StorageService.find_by_hash(teacher_id, file_hash, folder, resource_type)
+                if url:
+                    with lock:
+                        counters["deduplicated"] += 1
+                else:
+                    result, retries = StorageService._upload_with_retry(
+                        file_path, folder, resource_type, max_retries, backoff_seconds
+                    )
+                    url = StorageService._result_url(result) if result else None
+                    if file_hash and url:
+                        StorageService.record_hash(teacher_id, file_hash, result, os.path.basename(file_path), folder, resource_type)
+
+            with lock:
+                results[file_path] = url
+                durations[file_path] = round(time.perf_counter() - file_started, 3)
+                counters["completed"] += 1
+                counters["retries"] += retries
+                if url:
+                    counters["successful"] += 1
+                    logger.info(f"✓ [{counters['completed']}/{total_files}] Success: {os.path.basename(file_path)}")
+                else:
+                    counters["failed"] += 1
+                    logger.error(f"✗ [{counters['completed']}/{total_files}] Failed: {os.path.basename(file_path)}")
+                completed = counters["completed"]
+
+            if progress_callback:
+                try:
+                    progress_callback(completed, total_files, file_path, url)
+                except Exception as e:
+                    logger.error(f"Error in bulk upload progress callback: {e}")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for future in as_completed([pool.submit(upload_one, path) for path in file_paths]):
+                future.result()
+
+        elapsed = round(time.perf_counter() - started, 3)
         
         logger.info(f"\n{'=' * 60}")
-        logger.info(f"Bulk upload complete: {successful} successful, {failed} failed out of {total_files} total")
+        logger.info(f"Bulk upload complete: {counters['successful']} successful, {counters['failed']} failed "
+                    f"out of {total_files} total in {elapsed}s")
         logger.info(f"{'=' * 60}")
+
+        # Keep the caller's ordering in the returned map
+        results = {path: results[path] for path in file_paths}
+
+        if return_stats:
+            stats = {
+                "total": total_files,
+                "successful": counters["successful"],
+                "failed": counters["failed"],
+                "retries": counters["retries"],
+                "deduplicated": counters["deduplicated"],
+                "workers": max_workers,
+                "elapsed_seconds": elapsed,
+                "file_seconds": {path: durations[path] for path in file_paths}
+            }
+            return results, stats
         
         return results
 
@@ -195,14 +471,15 @@ class StorageService:
             return None
 
     @staticmethod
-    def delete_file(public_id: str, folder: str = None, resource_type: str = "raw") -> bool:
+    def delete_file(public_id: str, folder: str = None, resource_type: str = "raw", teacher_id: str = None) -> bool:
         """
-        Delete a file from Cloudinary
+        Delete a file from Cloudinary and the hash records pointing at it
         
         Args:
             public_id: Public ID of the file in Cloudinary
             folder: Optional folder path if file is in a folder
             resource_type: Type of resource - 'raw' for PDFs/docs, 'image' for images
+            teacher_id: Owner of the file, to clear only their hash records
         
         Returns:
             bool: True if deleted successfully, False otherwise
@@ -215,6 +492,7 @@ class StorageService:
             
             if result.get('result') == 'ok':
                 logger.info(f"File deleted successfully from Cloudinary: {full_public_id}")
+                StorageService.forget_hashes(full_public_id, teacher_id)
                 return True
             else:
                 logger.warning(f"File deletion result: {result.get('result')}")
@@ -1,15 +1,23 @@
 from core.firebase_client import db
+from services.list_cache import list_cache
+from services.pagination import list_page
+from services.performance_service import PerformanceService
+from services.unit_of_work import UnitOfWork
 from utils.app_logger import logger
 
 class SyllabusService:
 
     @staticmethod
-    def add_syllabus(teacher_id: str, syllabus_obj):
+    def add_syllabus(teacher_id: str, syllabus_obj, batch=None):
         """Add a syllabus with auto-generated ID and return the ID"""
         try:
             doc_ref = db.collection("teachers").document(teacher_id)\
                 .collection("syllabi").document()
-            doc_ref.set(syllabus_obj.to_dict())
+            unit = batch if batch is not None else UnitOfWork()
+            unit.set(doc_ref, syllabus_obj.to_dict())
+            PerformanceService.update_overview(teacher_id, flags={"syllabus_uploaded": True}, batch=unit)
+            if batch is None and not unit.commit():
+                return None
             return doc_ref.id
         except Exception as e:
             logger.error(f"Error adding syllabus: {e}")
@@ -26,11 +34,18 @@ class SyllabusService:
             return None
 
     @staticmethod
-    def list_syllabi(teacher_id: str):
-        try:
+    def list_syllabi(teacher_id: str, limit: int = None, start_after: str = None, fields: list = None):
+        def load():
             docs = db.collection("teachers").document(teacher_id)\
                     .collection("syllabi").stream()
             return [d.to_dict() for d in docs]
+
+        try:
+            if limit or start_after or fields:
+                collection = db.collection("teachers").document(teacher_id)\
+                    .collection("syllabi")
+                return list_page(collection, limit, start_after, fields)
+            return list_cache.get_or_load(teacher_id, "syllabi", load)
         except Exception as e:
             logger.error(f"Error listing syllabi: {e}")
             return []
@@ -1,26 +1,51 @@
 from core.firebase_client import db
+from services.list_cache import list_cache
+from services.pagination import list_page
+from services.performance_service import PerformanceService
+from services.unit_of_work import UnitOfWork
 from utils.app_logger import logger
 
 class TestPaperService:
 
     @staticmethod
-    def add_test_paper(teacher_id: str, test_obj):
+    def add_test_paper(teacher_id: str, test_obj, batch=None):
         """Add a test paper with auto-generated ID and return the ID"""
         try:
             doc_ref = db.collection("teachers").document(teacher_id)\
                 .collection("testPapers").document()
-            doc_ref.set(test_obj.to_dict())
+            unit = batch if batch is not None else UnitOfWork()
+            unit.set(doc_ref, test_obj.to_dict())
+            PerformanceService.update_overview(teacher_id, flags={"test_papers_uploaded": True}, batch=unit)
+            if batch is None and not unit.commit():
+                return None
             return doc_ref.id
         except Exception as e:
             logger.error(f"Error adding test paper: {e}")
             return None
 
     @staticmethod
-    def list_test_papers(teacher_id: str):
+    def get_test_paper(teacher_id: str, test_paper_id: str):
         try:
+            doc = db.collection("teachers").document(teacher_id)\
+                .collection("testPapers").document(test_paper_id).get()
+            return doc.to_dict() if doc.exists else None
+        except Exception as e:
+            logger.error(f"Error fetching test paper: {e}")
+            return None
+
+    @staticmethod
+    def list_test_papers(teacher_id: str, limit: int = None, start_after: str = None, fields: list = None):
+        def load():
             docs = db.collection("teachers").document(teacher_id)\
                     .collection("testPapers").stream()
             return [d.to_dict() for d in docs]
+
+        try:
+            if limit or start_after or fields:
+                collection = db.collection("teachers").document(teacher_id)\
+                    .collection("testPapers")
+                return list_page(collection, limit, start_after, fields)
+            return list_cache.get_or_load(teacher_id, "testPapers", load)
         except Exception as e:
             logger.error(f"Error listing test papers: {e}")
             return []
@@ -0,0 +1,84 @@
+from core.firebase_client import db
+from services.list_cache import list_cache
+from utils.app_logger import logger
+
+class UnitOfWorkError(Exception):
+    """A unit of work failed to commit or grew past Firestore's batch limit"""
+
+
+class UnitOfWork:
+    """
+    Collects Firestore writes from several services and commits them in a
+    single WriteBatch RPC. Service add/save methods accept ``batch=`` and
+    queue their write here instead of sending it straight away:
+
+        with UnitOfWork() as batch:
+            UploadService.add_upload(teacher_id, upload_obj, batch=batch)
+            TestPaperService.add_test_paper(teacher_id, test_obj, batch=batch)
+
+    Cached list_* results for every subcollection touched by the batch are
+    invalidated once it commits.
+
+    Firestore caps a batch at 500 writes. A unit of work is always committed
+    atomically, so queuing more than MAX_WRITES raises UnitOfWorkError;
+    bulk imports split themselves into several units (see chunks()).
+    Leaving a ``with`` block whose commit fails raises UnitOfWorkError too.
+    """
+
+    MAX_WRITES = 500
+
+    def __init__(self):
+        self._batch = db.batch()
+        self._writes = 0
+        self._paths = set()
+
+    def set(self, doc_ref, data: dict, merge: bool = False):
+        self._count_write(doc_ref)
+        self._batch.set(doc_ref, data, merge=merge)
+
+    def update(self, doc_ref, data: dict):
+        self._count_write(doc_ref)
+        self._batch.update(doc_ref, data)
+
+    def delete(self, doc_ref):
+        self._count_write(doc_ref)
+        self._batch.delete(doc_ref)
+
+    @classmethod
+    def chunks(cls, items: list, reserved: int = 0):
+        """Split items into runs that fit in one unit alongside ``reserved`` other writes"""
+        size = cls.MAX_WRITES - reserved
+        return [items[i:i + size] for i in range(0, len(items), size)]
+
+    def _count_write(self, doc_ref):
+        if self._writes >= self.MAX_WRITES:
+            raise UnitOfWorkError(f"A unit of work is limited to {self.MAX_WRITES} writes")
+        self._paths.add(doc_ref.path)
+        self._writes += 1
+
+    def _invalidate_cached_lists(self):
+        for path in self._paths:
+            list_cache.invalidate_path(path)
+        self._paths = set()
+
+    def commit(self) -> bool:
+        """Send all queued writes in one RPC. Returns False if the commit failed."""
+        try:
+            if self._writes:
+                self._batch.commit()
+            self._batch = db.batch()
+            self._writes = 0
+            self._invalidate_cached_lists()
+            return True
+        except Exception as e:
+            logger.error(f"Error committing batch: {e}")
+            logger.exception("Full error details:")
+            return False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None and not self.commit():
+            raise UnitOfWorkError("Batch commit failed")
+        return False
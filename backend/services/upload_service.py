@@ -1,35 +1,62 @@
 from core.firebase_client import db
+from services.list_cache import list_cache
+from services.pagination import list_page
 from utils.app_logger import logger
 
 class UploadService:
 
     @staticmethod
-    def record_upload(teacher_id: str, upload_id: str, upload_obj):
+    def record_upload(teacher_id: str, upload_id: str, upload_obj, batch=None):
         try:
-            db.collection("teachers").document(teacher_id)\
-                .collection("uploads").document(upload_id)\
-                .set(upload_obj.to_dict(), merge=True)
+            doc_ref = db.collection("teachers").document(teacher_id)\
+                .collection("uploads").document(upload_id)
+            if batch is not None:
+                batch.set(doc_ref, upload_obj.to_dict(), merge=True)
+            else:
+                doc_ref.set(upload_obj.to_dict(), merge=True)
+                list_cache.invalidate(teacher_id, "uploads")
         except Exception as e:
             logger.error(f"Error recording upload: {e}")
 
     @staticmethod
-    def add_upload(teacher_id: str, upload_obj):
-        """Add an upload record with auto-generated ID and return the ID"""
+    def add_upload(teacher_id: str, upload_obj, batch=None):
+        """
+        Add an upload record and return the ID. Records with a file_hash are
+        keyed by type + hash, so re-uploading identical content updates the
+        existing record instead of adding a duplicate.
+        """
         try:
-            doc_ref = db.collection("teachers").document(teacher_id)\
-                .collection("uploads").document()
-            doc_ref.set(upload_obj.to_dict())
+            uploads = db.collection("teachers").document(teacher_id)\
+                .collection("uploads")
+            file_hash = getattr(upload_obj, "file_hash", None)
+            if file_hash:
+                doc_ref = uploads.document(f"{upload_obj.file_type}_{file_hash}")
+            else:
+                doc_ref = uploads.document()
+            # merge so a re-upload doesn't drop fields of the existing record
+            if batch is not None:
+                batch.set(doc_ref, upload_obj.to_dict(), merge=True)
+            else:
+                doc_ref.set(upload_obj.to_dict(), merge=True)
+                list_cache.invalidate(teacher_id, "uploads")
             return doc_ref.id
         except Exception as e:
             logger.error(f"Error adding upload: {e}")
             return None
 
     @staticmethod
-    def list_uploads(teacher_id: str):
-        try:
+    def list_uploads(teacher_id: str, limit: int = None, start_after: str = None, fields: list = None):
+        def load():
             docs = db.collection("teachers").document(teacher_id)\
                     .collection("uploads").stream()
             return [d.to_dict() for d in docs]
+
+        try:
+            if limit or start_after or fields:
+                collection = db.collection("teachers").document(teacher_id)\
+                    .collection("uploads")
+                return list_page(collection, limit, start_after, fields)
+            return list_cache.get_or_load(teacher_id, "uploads", load)
         except Exception as e:
             logger.error(f"Error listing uploads: {e}")
             return []
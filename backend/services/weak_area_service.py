@@ -1,35 +1,78 @@
 from core.firebase_client import db
+from services.list_cache import list_cache
+from services.pagination import list_page
+from services.performance_service import PerformanceService
+from services.unit_of_work import UnitOfWork
 from utils.app_logger import logger
 
 class WeakAreaService:
 
     @staticmethod
-    def save_weak_area(teacher_id: str, topic_id: str, weak_obj):
+    def save_weak_area(teacher_id: str, topic_id: str, weak_obj, batch=None):
         try:
-            db.collection("teachers").document(teacher_id)\
-                .collection("weakAreas").document(topic_id)\
-                .set(weak_obj.to_dict(), merge=True)
+            doc_ref = db.collection("teachers").document(teacher_id)\
+                .collection("weakAreas").document(topic_id)
+            if batch is not None:
+                # The caller owns the batch, so it also owns weak_areas_count
+                batch.set(doc_ref, weak_obj.to_dict(), merge=True)
+            else:
+                PerformanceService.upsert_counted(teacher_id, doc_ref, weak_obj.to_dict(), "weak_areas_count")
+                list_cache.invalidate(teacher_id, "weakAreas")
         except Exception as e:
             logger.error(f"Error saving weak area: {e}")
 
     @staticmethod
-    def add_weak_area(teacher_id: str, weak_obj):
+    def add_weak_area(teacher_id: str, weak_obj, batch=None):
         """Add a weak area with auto-generated ID and return the ID"""
         try:
             doc_ref = db.collection("teachers").document(teacher_id)\
                 .collection("weakAreas").document()
-            doc_ref.set(weak_obj.to_dict())
+            unit = batch if batch is not None else UnitOfWork()
+            unit.set(doc_ref, weak_obj.to_dict())
+            PerformanceService.update_overview(teacher_id, counters={"weak_areas_count": 1}, batch=unit)
+            if batch is None and not unit.commit():
+                return None
             return doc_ref.id
         except Exception as e:
             logger.error(f"Error adding weak area: {e}")
             return None
 
     @staticmethod
-    def list_weak_areas(teacher_id: str):
-        try:
+    def add_weak_areas(teacher_id: str, weak_objs: list):
+        """
+        Add many weak areas in atomic batches (documents plus counter) and
+        return the IDs written. If a batch fails, only the IDs of the
+        batches committed before it are returned.
+        """
+        ids = []
+        for chunk in UnitOfWork.chunks(weak_objs, reserved=1):
+            batch = UnitOfWork()
+            chunk_ids = []
+            for weak_obj in chunk:
+                doc_ref = db.collection("teachers").document(teacher_id)\
+                    .collection("weakAreas").document()
+                batch.set(doc_ref, weak_obj.to_dict())
+                chunk_ids.append(doc_ref.id)
+            PerformanceService.update_overview(teacher_id, counters={"weak_areas_count": len(chunk_ids)}, batch=batch)
+            if not batch.commit():
+                logger.error(f"Added {len(ids)} of {len(weak_objs)} weak areas before a batch failed")
+                return ids
+            ids.extend(chunk_ids)
+        return ids
+
+    @staticmethod
+    def list_weak_areas(teacher_id: str, limit: int = None, start_after: str = None, fields: list = None):
+        def load():
             docs = db.collection("teachers").document(teacher_id)\
                     .collection("weakAreas").stream()
             return [d.to_dict() for d in docs]
+
+        try:
+            if limit or start_after or fields:
+                collection = db.collection("teachers").document(teacher_id)\
+                    .collection("weakAreas")
+                return list_page(collection, limit, start_after, fields)
+            return list_cache.get_or_load(teacher_id, "weakAreas", load)
         except Exception as e:
             logger.error(f"Error listing weak areas: {e}")
             return []
@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Make backend/ packages (config, services, ...) importable. Kept at the end
+# of sys.path so backend/fastapi.py doesn't shadow the fastapi package, even
+# when "python -m pytest" was run from backend/ and put it first.
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path[:] = [p for p in sys.path if os.path.abspath(p or os.curdir) != BACKEND_DIR]
+sys.path.append(BACKEND_DIR)
@@ -0,0 +1,167 @@
+import asyncio
+import importlib.util
+import json
+import os
+import sys
+import types
+from unittest import mock
+
+import httpx
+import pytest
+from fastapi.exceptions import FastAPIError
+from fastapi.testclient import TestClient
+
+from config.settings import settings
+from utils.result_cache import ResultCache
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+QUESTIONS = [
+    {"number": 1, "question": "2 + 2", "topic": "Arithmetic"},
+    {"number": 2, "question": "Capital of France", "topic": "Geography"},
+]
+COMPARISON = [
+    {"question_number": 1, "topic": "Arithmetic", "teacher_answer": "4", "student_answer": "4", "correct": True},
+    {"question_number": 2, "topic": "Geography", "teacher_answer": "Paris", "student_answer": "Rome", "correct": False},
+]
+URLS = {"questionpdf_url": "https://files.test/q.pdf", "teacher_pdf": "https://files.test/t.pdf",
+        "student_pdf": "https://files.test/s.pdf"}
+
+
+class StubGateway:
+    """Returns canned Gemini responses in call order: extraction, then comparison"""
+
+    def __init__(self):
+        self.responses = [json.dumps(QUESTIONS), json.dumps(COMPARISON)]
+
+    async def generate_async(self, timeout=None, **request):
+        return types.SimpleNamespace(text=self.responses.pop(0))
+
+    async def stream_async(self, timeout=None, **request):
+        for text in ("Revise ", "capitals."):
+            yield types.SimpleNamespace(text=text)
+
+    async def create_cache_async(self, model, config):
+        raise RuntimeError("caching disabled in tests")
+
+
+@pytest.fixture
+def engine(monkeypatch, tmp_path):
+    """AI_engine with the stub gateway and throwaway caches"""
+    settings.GEMINI_API_KEY = settings.GEMINI_API_KEY or "test-key"
+    from services import AI_engine
+
+    monkeypatch.setattr(AI_engine, "gateway", StubGateway())
+    for name in ("extraction_cache", "plan_cache", "pdf_text_cache"):
+        monkeypatch.setattr(AI_engine, name, ResultCache(str(tmp_path / name), settings.AI_CACHE_MAX_BYTES))
+    monkeypatch.setattr(settings, "LOCAL_GRADING", False)
+    return AI_engine
+
+
+@pytest.fixture
+def exam_files(tmp_path):
+    files = []
+    for name in ("question.pdf", "teacher.pdf", "student.pdf"):
+        path = tmp_path / name
+        path.write_bytes(b"%PDF-1.4 " + name.encode())
+        files.append(str(path))
+    return files
+
+
+async def collect(events):
+    return [event async for event in events]
+
+
+def test_events_follow_the_pipeline_stages(engine, exam_files):
+    events = asyncio.run(collect(engine.process_exam_full_events(*exam_files, mode="two_step")))
+
+    assert [event["event"] for event in events] == [
+        "questions_extracted", "comparison_done", "topic_stats",
+        "weakest_topic", "plan_token", "plan_token", "done"
+    ]
+    data = {event["event"]: event["data"] for event in events}
+    assert data["questions_extracted"] == {"questions": QUESTIONS}
+    assert data["comparison_done"] == {"comparison": COMPARISON}
+    assert data["weakest_topic"]["weakest_topic"] == "Geography"
+    assert data["done"]["learning_plan"] == "Revise capitals."
+    assert data["done"]["topic_stats"] == data["topic_stats"]["topic_stats"]
+
+
+def test_events_stop_when_a_stage_fails(engine, exam_files):
+    engine.gateway.responses = [json.dumps(QUESTIONS), "not json"]
+
+    async def run():
+        seen = []
+        with pytest.raises(ValueError):
+            async for event in engine.process_exam_full_events(*exam_files, mode="two_step"):
+                seen.append(event["event"])
+        return seen
+
+    assert asyncio.run(run()) == ["questions_extracted"]
+
+
+def load_app():
+    """Import backend/fastapi.py under another name, with a stand-in Firestore client"""
+    sys.modules.setdefault("core.firebase_client", types.SimpleNamespace(db=mock.MagicMock(), async_db=None))
+    spec = importlib.util.spec_from_file_location("lumos_app", os.path.join(BACKEND_DIR, "fastapi.py"))
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    except FastAPIError as e:
+        # Newer FastAPI releases reject the plain-class body parameters of
+        # the add_* routes while the app is being built
+        pytest.skip(f"app can't be built with this FastAPI version: {e}")
+    return module
+
+
+@pytest.fixture
+def app_module(engine):
+    return load_app()
+
+
+def serve_files(app_module, missing=()):
+    def handler(request):
+        if str(request.url) in missing:
+            return httpx.Response(404)
+        return httpx.Response(200, content=b"%PDF-1.4 " + str(request.url).encode())
+
+    app_module.app.state.http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def read_events(response):
+    events = []
+    for message in response.text.strip().split("\n\n"):
+        event, data = message.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_stream_emits_stages_in_order(app_module):
+    serve_files(app_module)
+    client = TestClient(app_module.app)
+
+    response = client.get("/process_exam_full_stream/", params={**URLS, "mode": "two_step"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = read_events(response)
+    assert [name for name, _ in events] == [
+        "files_downloaded", "questions_extracted", "comparison_done", "topic_stats",
+        "weakest_topic", "plan_token", "plan_token", "done"
+    ]
+    data = dict(events)
+    assert data["questions_extracted"] == {"questions": QUESTIONS}
+    assert data["weakest_topic"]["weakest_topic"] == "Geography"
+    assert data["done"]["learning_plan"] == "Revise capitals."
+
+
+def test_stream_reports_download_failure_as_error_event(app_module):
+    serve_files(app_module, missing={URLS["student_pdf"]})
+    client = TestClient(app_module.app)
+
+    response = client.get("/process_exam_full_stream/", params=URLS)
+
+    assert response.status_code == 200
+    events = read_events(response)
+    assert [name for name, _ in events] == ["error"]
+    assert "Error downloading PDF" in events[0][1]["detail"]
@@ -0,0 +1,122 @@
+import pytest
+from services import local_grader
+from services.local_grader import answers_match, grade_locally, normalize_answer, parse_numbered_answers
+
+
+QUESTIONS = [{"number": n, "question": f"Q{n}", "topic": f"Topic {n}"} for n in range(1, 5)]
+
+
+# -------------------------------------------------------
+# parse_numbered_answers
+# -------------------------------------------------------
+@pytest.mark.parametrize("line, expected", [
+    ("1. B", {1: "B"}),
+    ("1) 42", {1: "42"}),
+    ("Q1: yes", {1: "yes"}),
+    ("Question 3 - (c)", {3: "(c)"}),
+    ("4 = 3/4", {4: "3/4"}),
+    ("  7.   Paris  ", {7: "Paris"}),
+])
+def test_parse_numbered_answers_formats(line, expected):
+    assert parse_numbered_answers(line) == expected
+
+
+def test_parse_numbered_answers_joins_continuation_lines():
+    text = "1. The mitochondria\nproduces energy\n\n2. B"
+    assert parse_numbered_answers(text) == {1: "The mitochondria produces energy", 2: "B"}
+
+
+def test_decimal_line_is_a_continuation_not_a_question_number():
+    assert parse_numbered_answers("3.\n3.5") == {3: "3.5"}
+    assert parse_numbered_answers("3. 3.5") == {3: "3.5"}
+
+
+def test_text_before_the_first_number_is_ignored():
+    assert parse_numbered_answers("Name: Ada\n1. A") == {1: "A"}
+
+
+# -------------------------------------------------------
+# normalize_answer
+# -------------------------------------------------------
+@pytest.mark.parametrize("answer, expected", [
+    ("B", ("option", "b")),
+    ("(c)", ("option", "c")),
+    ("d)", ("option", "d")),
+    ("a.", ("option", "a")),
+    ("42", ("number", 42.0)),
+    ("-0.5", ("number", -0.5)),
+    ("1,000", ("number", 1000.0)),
+    ("3/4", ("number", 0.75)),
+    (" 3 / 4 ", ("number", 0.75)),
+    ("Paris.", ("word", "paris")),
+    ("well-known", ("word", "well-known")),
+])
+def test_normalize_answer_objective(answer, expected):
+    assert normalize_answer(answer) == expected
+
+
+@pytest.mark.parametrize("answer", ["", "   ", "1/0", "x + 2", "B because it is larger", "12 cm", "1,00"])
+def test_normalize_answer_leaves_the_rest_to_the_llm(answer):
+    assert normalize_answer(answer) is None
+
+
+# -------------------------------------------------------
+# answers_match
+# -------------------------------------------------------
+def test_answers_match_numbers_within_tolerance(monkeypatch):
+    monkeypatch.setattr(local_grader.settings, "GRADER_NUMERIC_TOLERANCE", 1e-6)
+    assert answers_match(("number", 0.75), ("number", 0.7500000001))
+    assert not answers_match(("number", 1000.0), ("number", 999.0))
+
+
+def test_answers_match_exact_for_options_and_words():
+    assert answers_match(("option", "b"), ("option", "b"))
+    assert not answers_match(("option", "b"), ("option", "c"))
+    assert answers_match(("word", "paris"), ("word", "paris"))
+
+
+# -------------------------------------------------------
+# grade_locally
+# -------------------------------------------------------
+def test_grade_locally_decides_objective_questions():
+    teacher = "1. B\n2) 3/4\nQ3: Paris\n4. 1,000"
+    student = "1. (b)\n2) 0.75\nQ3: paris.\n4. 999"
+
+    results, undecided = grade_locally(QUESTIONS, teacher, student)
+
+    assert undecided == []
+    assert [(r["question_number"], r["correct"]) for r in results] == [(1, True), (2, True), (3, True), (4, False)]
+    assert results[0] == {
+        "question_number": 1,
+        "topic": "Topic 1",
+        "teacher_answer": "B",
+        "student_answer": "(b)",
+        "correct": True,
+        "graded_by": "local"
+    }
+
+
+def test_grade_locally_sends_ambiguous_questions_to_the_llm():
+    teacher = "1. B\n2. Energy is conserved in a closed system\n3. 12"
+    student = "1. B because it is bigger\n2. energy\n3. twelve"
+
+    results, undecided = grade_locally(QUESTIONS[:3], teacher, student)
+
+    assert results == []
+    assert undecided == [1, 2, 3]
+
+
+def test_grade_locally_missing_student_answer_is_undecided():
+    results, undecided = grade_locally(QUESTIONS[:2], "1. A\n2. C", "1. A")
+
+    assert [r["question_number"] for r in results] == [1]
+    assert undecided == [2]
+
+
+def test_grade_locally_normalizes_question_numbers():
+    questions = [{"number": "1", "topic": "T"}, {"number": 2.0, "topic": "T"}, {"number": "1a", "topic": "T"}]
+
+    results, undecided = grade_locally(questions, "1. A\n2. 5", "1. A\n2. 5")
+
+    assert [r["question_number"] for r in results] == [1, 2]
+    assert undecided == ["1a"]
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from utils.app_logger import logger
+
+
+class ResultCache:
+    """
+    Persistent, content-addressed JSON cache stored on local disk.
+
+    Each entry lives in its own file named after its key. Reads refresh the
+    file's modification time, so when the directory grows past ``max_bytes``
+    the least recently used entries are evicted first. With ``ttl_seconds``
+    entries older than that are treated as misses.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int, ttl_seconds: float = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """Build a SHA-256 key from any mix of bytes and str parts"""
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode("utf-8")
+            # Length-prefix every part so ("ab", "c") and ("a", "bc") differ
+            digest.update(len(part).to_bytes(8, "big"))
+            digest.update(part)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str):
+        """Return the cached value for ``key``, or None on a miss"""
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+            if self.ttl_seconds is not None and time.time() - entry["stored_at"] > self.ttl_seconds:
+                self.delete(key)
+                return None
+            os.utime(path)
+            return entry["value"]
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Dropping unreadable cache entry {key}: {e}")
+            self.delete(key)
+            return None
+
+    def set(self, key: str, value):
+        """Store a JSON-serialisable value and evict old entries if needed"""
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stored_at": time.time(), "value": value}, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            logger.error(f"Error writing cache entry {key}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._evict()
+
+    def delete(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.cache_dir):
+                if not entry.name.endswith(".json"):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+
+            if total <= self.max_bytes:
+                return
+
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except FileNotFoundError:
+                    pass